@@ -1,9 +1,35 @@
 from pathlib import Path
 import pygame
+import os
 import json
+import time
 import colorsys
-import copy
 import yaml
+import numpy as np
+import threading
+import sys
+import hashlib
+import tempfile
+import uuid
+from collections import OrderedDict, Counter
+from contextlib import ExitStack
+from math import ceil
+
+try:
+    from PIL import Image     # optional: lazy decoding of very large images
+except ImportError:
+    Image = None
+
+try:
+    import cv2                # optional: optical flow for label propagation
+except ImportError:
+    cv2 = None
+
+# sibling nodes import from the pack folder; shared helpers live in class_registry
+PACK_ROOT = str(Path(__file__).resolve().parent.parent)
+if PACK_ROOT not in sys.path:
+    sys.path.append(PACK_ROOT)
+from class_registry.__main__ import load_node, temp_path, write_atomic, open_large_image
 
 # =====================
 # CONFIG
@@ -18,24 +44,118 @@ BG_COLOR = (30, 30, 30)
 BOX_THICKNESS = 2
 FONT_COLOR = (220, 220, 220)
 
+# ===== RENDER CACHE =====
+RENDER_CACHE_PIXELS = 24_000_000   # scaled pixels kept across zoom levels
+FULL_RENDER_PIXELS = 4_000_000     # bigger zoom levels only scale the viewport
+RENDER_MARGIN = 256                # extra pixels around the viewport (cheap panning)
+PYRAMID_MIN_SIZE = 256
+
+# ===== LARGE IMAGES (tiled) =====
+TILED_MIN_PIXELS = 50_000_000              # bigger images are decoded lazily
+OVERVIEW_SIZE = 2048                       # long side of the reduced overview
+TILE_SIZE = 512                            # full-resolution tile (image pixels)
+TILE_CACHE_BYTES = 256 * 1024 * 1024       # scaled tiles kept per image
+TILE_DISK_DIR = Path(tempfile.gettempdir()) / "annotate_tiles"
+TILE_DISK_BYTES = 8 * 1024 ** 3            # decoded full-resolution files kept
+DECODE_RETRY = 5.0                         # seconds before a failed decode is tried again
+
+# ===== PREFETCH =====
+PREFETCH_RADIUS = 3                        # images decoded ahead / behind
+PREFETCH_CACHE_BYTES = 768 * 1024 * 1024   # decoded images kept in memory
+
+# ===== UNDO =====
+UNDO_MAX_BYTES = 4 * 1024 * 1024           # per image
+UNDO_SESSION_BYTES = 64 * 1024 * 1024      # all images of the session
+
+# ===== HIT TEST =====
+GRID_CELL = 32           # spatial index cell size (display units at zoom 1)
+VERTEX_PICK = 6          # vertex pick distance (display units at zoom 1)
+
+# ===== AUTOSAVE =====
+AUTOSAVE_DELAY = 1.0                       # seconds after the last edit
+JOURNAL_NAME = ".autosave_journal.{}.jsonl"   # in labels_dir, one per session
+
+# ===== SUGGESTIONS (model pre-annotation) =====
+SUGGEST_AHEAD = 8                 # unlabeled images predicted ahead of the cursor
+SUGGEST_BATCH = 4                 # images per model call
+SUGGEST_COLOR = (255, 0, 255)
+
+# ===== POLYGON SIMPLIFICATION =====
+SIMPLIFY_TOLERANCE = 1.0          # Douglas-Peucker tolerance (image pixels)
+SIMPLIFY_MAX_VERTICES = 256       # vertex budget per polygon
+
+# ===== LABEL PROPAGATION (video frame sequences) =====
+PROPAGATE_SIZE = 960              # long side of the grayscale frames used for motion
+PROPAGATE_SEARCH = 24             # block-matching search radius (reduced pixels)
+PROPAGATE_MIN_POINTS = 4          # tracked corners needed per box (OpenCV)
+
+# ===== IDLE =====
+IDLE_WAIT_MS = 250                # event wait while idle (background results are polled)
+
+# ===== TEXT CACHE =====
+TEXT_CACHE_SIZE = 4096            # rendered strings kept (LRU)
+
+# ===== SHARED CLASSES =====
+CLASS_POLL_INTERVAL = 1.0         # seconds between checks of classes.json
+
+
 def point_in_polygon(px, py, polygon):
     """
-    Ray casting algorithm
+    Ray casting algorithm (vectorised over the edges)
     """
-    inside = False
-    n = len(polygon)
-
-    for i in range(n):
-        x1, y1 = polygon[i]
-        x2, y2 = polygon[(i + 1) % n]
+    pts = np.asarray(polygon, dtype=float)
+    x1, y1 = pts[:, 0], pts[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
 
-        if ((y1 > py) != (y2 > py)) and \
-           (px < (x2 - x1) * (py - y1) / (y2 - y1 + 1e-9) + x1):
-            inside = not inside
+    crosses = (y1 > py) != (y2 > py)
+    edge_x = (x2 - x1) * (py - y1) / (y2 - y1 + 1e-9) + x1
 
-    return inside
+    return bool(np.count_nonzero(crosses & (px < edge_x)) % 2)
 
-def detect_corner(mx, my, x, y, w, h):
+def simplify_polygon(poly, tolerance=SIMPLIFY_TOLERANCE, max_vertices=SIMPLIFY_MAX_VERTICES):
+    """
+    Douglas-Peucker on a closed polygon (tolerance in image pixels).
+    While the result is over max_vertices the tolerance is doubled.
+    """
+    poly = np.asarray(poly, dtype=float)
+    n = len(poly)
+    if n <= 4:
+        return poly
+
+    # split the ring at the vertex farthest from the first one
+    far = int(np.argmax(((poly - poly[0]) ** 2).sum(axis=1)))
+    ring = np.vstack([poly, poly[:1]])
+
+    while True:
+        keep = np.zeros(n, dtype=bool)
+        keep[[0, far]] = True
+        stack = [(0, far, True), (far, n, True)]    # first split always -> >= 3 vertices
+
+        while stack:
+            a, b, force = stack.pop()
+            if b - a < 2:
+                continue
+            # distance of the points between a and b to the segment a-b
+            p, q = ring[a], ring[b]
+            rel = ring[a + 1:b] - p
+            d = q - p
+            t = np.clip(rel @ d / max(d @ d, 1e-12), 0.0, 1.0)
+            dist = np.hypot(*(rel - t[:, None] * d).T)
+
+            k = int(np.argmax(dist))
+            if force or dist[k] > tolerance:
+                m = a + 1 + k
+                keep[m] = True
+                stack += [(a, m, False), (m, b, False)]
+
+        out = poly[keep]
+        if len(out) < 3:
+            return poly     # degenerate (all points equal)
+        if len(out) <= max(max_vertices, 4):
+            return out
+        tolerance *= 2
+
+def detect_corner(mx, my, x, y, w, h, handle=HANDLE_SIZE):
     corners = {
         "tl": (x, y),
         "tr": (x + w, y),
@@ -43,10 +163,378 @@ def detect_corner(mx, my, x, y, w, h):
         "br": (x + w, y + h),
     }
     for name, (cx, cy) in corners.items():
-        if abs(mx - cx) < HANDLE_SIZE and abs(my - cy) < HANDLE_SIZE:
+        if abs(mx - cx) < handle and abs(my - cy) < handle:
             return name
     return None
 
+# =====================
+# ANNOTATION STORE
+# =====================
+class AnnotationStore:
+    """
+    Boxes of one image, in original-image pixels.
+      xywh    (N, 4) float   box x, y, w, h
+      cls     (N,)   int     class id
+      verts   (M, 2) float   all polygon vertices, packed
+      offsets (N+1,) int     polygon of box i = verts[offsets[i]:offsets[i+1]]
+      rev     (N,)   int     row revision, bumped on every change of the row
+    Single boxes travel as records (x, y, w, h, cid, poly | None) - undo
+    commands keep those, with their own copy of the polygon.
+    """
+
+    def __init__(self):
+        self.xywh = np.zeros((0, 4))
+        self.cls = np.zeros(0, dtype=np.int64)
+        self.verts = np.zeros((0, 2))
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.rev = np.zeros(0, dtype=np.int64)
+        self.counter = 0       # bumped on every change of the store
+        self.screen_key = None
+        self.screen_cache = None
+        self.screen_view = None
+        self.screen_rows = {}   # rev -> (screen box, screen polygon) at screen_view
+
+    def __len__(self):
+        return len(self.cls)
+
+    def stamp(self):
+        self.counter += 1
+        return self.counter
+
+    # ----- YOLO txt -----
+    @classmethod
+    def from_yolo(cls, text, iw, ih):
+        records = []
+        for line in text.splitlines():
+            parts = list(map(float, line.split()))
+            if not parts:
+                continue
+            cid = int(parts[0])
+
+            # ===== SEGMENTATION =====
+            if len(parts) > 5:
+                poly = np.array(parts[1:], dtype=float).reshape(-1, 2) * (iw, ih)
+                poly = simplify_polygon(poly)
+                x, y = poly.min(axis=0)
+                w, h = poly.max(axis=0) - (x, y)
+                records.append((x, y, w, h, cid, poly))
+
+            # ===== BBOX =====
+            else:
+                _, xc, yc, bw, bh = parts
+                records.append((
+                    (xc - bw / 2) * iw,
+                    (yc - bh / 2) * ih,
+                    bw * iw,
+                    bh * ih,
+                    cid,
+                    None
+                ))
+
+        store = cls()
+        store.set_records(records)
+        return store
+
+    def to_yolo(self, iw, ih, simplify=False):
+        lines = []
+        for i in range(len(self)):
+            cid = int(self.cls[i])
+            poly = self.polygon(i)
+
+            # ===== SEGMENTATION (YOLOv8) =====
+            if len(poly) >= 3:
+                if simplify:
+                    poly = simplify_polygon(poly)
+                norm = (poly / (iw, ih)).ravel()
+                lines.append(f"{cid} " + " ".join(f"{v:.6f}" for v in norm) + "\n")
+
+            # ===== BBOX (fallback) =====
+            else:
+                x, y, w, h = self.xywh[i]
+                lines.append(
+                    f"{cid} {(x + w / 2) / iw:.6f} {(y + h / 2) / ih:.6f} "
+                    f"{w / iw:.6f} {h / ih:.6f}\n"
+                )
+        return "".join(lines)
+
+    # ----- records -----
+    def polygon(self, i):
+        return self.verts[self.offsets[i]:self.offsets[i + 1]]
+
+    def get(self, i):
+        x, y, w, h = self.xywh[i].tolist()
+        poly = self.polygon(i)
+        return (x, y, w, h, int(self.cls[i]), poly.copy() if len(poly) else None)
+
+    def records(self):
+        return [self.get(i) for i in range(len(self))]
+
+    def set_records(self, records):
+        polys = [
+            np.zeros((0, 2)) if r[5] is None else np.asarray(r[5], dtype=float).reshape(-1, 2)
+            for r in records
+        ]
+        self.xywh = np.array([r[:4] for r in records], dtype=float).reshape(-1, 4)
+        self.cls = np.array([r[4] for r in records], dtype=np.int64)
+        self.verts = np.concatenate(polys) if polys else np.zeros((0, 2))
+        self.offsets = np.concatenate(([0], np.cumsum([len(p) for p in polys]))).astype(np.int64)
+        self.rev = np.array([self.stamp() for _ in records], dtype=np.int64)
+
+    def insert(self, i, record):
+        x, y, w, h, cid, poly = record
+        poly = np.zeros((0, 2)) if poly is None else np.asarray(poly, dtype=float).reshape(-1, 2)
+        o = self.offsets[i]
+
+        self.xywh = np.insert(self.xywh, i, (x, y, w, h), axis=0)
+        self.cls = np.insert(self.cls, i, cid)
+        self.verts = np.insert(self.verts, o, poly, axis=0)
+        self.offsets = np.concatenate((self.offsets[:i + 1], self.offsets[i:] + len(poly)))
+        self.rev = np.insert(self.rev, i, self.stamp())
+
+    def delete(self, i):
+        record = self.get(i)
+        a, b = self.offsets[i], self.offsets[i + 1]
+
+        self.xywh = np.delete(self.xywh, i, axis=0)
+        self.cls = np.delete(self.cls, i)
+        self.verts = np.delete(self.verts, np.s_[a:b], axis=0)
+        self.offsets = np.concatenate((self.offsets[:i], self.offsets[i + 1:] - (b - a)))
+        self.rev = np.delete(self.rev, i)
+        self.stamp()
+        return record
+
+    def replace(self, i, record):
+        x, y, w, h, cid, poly = record
+        n = 0 if poly is None else len(poly)
+        if n != self.offsets[i + 1] - self.offsets[i]:
+            self.delete(i)
+            self.insert(i, record)
+            return
+
+        # same vertex count -> in place
+        self.xywh[i] = (x, y, w, h)
+        self.cls[i] = cid
+        if n:
+            self.verts[self.offsets[i]:self.offsets[i + 1]] = poly
+        self.rev[i] = self.stamp()
+
+    # ----- edits -----
+    def set_class(self, i, cid):
+        self.cls[i] = cid
+        self.rev[i] = self.stamp()
+
+    def set_box(self, i, x, y, w, h):
+        # polygon follows the box (resize handles)
+        ox, oy, ow, oh = self.xywh[i]
+        poly = self.polygon(i)
+        if len(poly):
+            sx = w / ow if ow else 1.0
+            sy = h / oh if oh else 1.0
+            poly[:] = (x, y) + (poly - (ox, oy)) * (sx, sy)
+        self.xywh[i] = (x, y, w, h)
+        self.rev[i] = self.stamp()
+
+    def move_vertex(self, i, v, x, y):
+        poly = self.polygon(i)
+        poly[v] = (x, y)
+        lo = poly.min(axis=0)
+        self.xywh[i] = (*lo, *(poly.max(axis=0) - lo))
+        self.rev[i] = self.stamp()
+
+    def remove_class(self, cid):
+        # drop class cid, shift the ids above it down by one
+        keep = self.cls != cid
+        counts = np.diff(self.offsets)
+
+        self.xywh = self.xywh[keep]
+        self.cls = self.cls[keep]
+        self.cls[self.cls > cid] -= 1
+        self.verts = self.verts[np.repeat(keep, counts)]
+        self.offsets = np.concatenate(([0], np.cumsum(counts[keep]))).astype(np.int64)
+        self.rev = np.array([self.stamp() for _ in range(len(self.cls))], dtype=np.int64)
+
+    def map_classes(self, mapping):
+        # class ids old -> new, None drops the box (ids renumbered elsewhere)
+        new = np.array([
+            -1 if mapping.get(c, c) is None else mapping.get(c, c)
+            for c in self.cls.tolist()
+        ], dtype=np.int64)
+        keep = new >= 0
+        counts = np.diff(self.offsets)
+
+        self.xywh = self.xywh[keep]
+        self.cls = new[keep]
+        self.verts = self.verts[np.repeat(keep, counts)]
+        self.offsets = np.concatenate(([0], np.cumsum(counts[keep]))).astype(np.int64)
+        self.rev = np.array([self.stamp() for _ in range(len(self.cls))], dtype=np.int64)
+
+    # ----- screen space -----
+    def to_screen(self, view, offset_x, offset_y):
+        # vectorised image px -> screen px for every box and vertex
+        xywh = self.xywh * view
+        xywh[:, 0] += offset_x
+        xywh[:, 1] += offset_y
+        verts = self.verts * view + (offset_x, offset_y)
+        return xywh, verts
+
+    def screen_row(self, i, view, offset_x, offset_y):
+        # to_screen() of one row
+        x, y, w, h = (self.xywh[i] * view).tolist()
+        a, b = self.offsets[i], self.offsets[i + 1]
+        poly = (self.verts[a:b] * view + (offset_x, offset_y)).tolist() if b - a >= 3 else None
+        return [x + offset_x, y + offset_y, w, h], poly
+
+    def screen_geometry(self, view, offset_x, offset_y):
+        """
+        Screen px lists for drawing. Zoom / pan re-projects every row, an
+        edit only the rows whose revision changed (rows cached by rev).
+        """
+        view_key = (view, offset_x, offset_y)
+        if self.screen_key == (self.counter, view_key):
+            return self.screen_cache
+
+        revs = self.rev.tolist()
+        if self.screen_view != view_key:
+            xywh, verts = self.to_screen(view, offset_x, offset_y)
+            boxes = xywh.tolist()
+            verts = verts.tolist()
+            offsets = self.offsets.tolist()
+            polys = [
+                verts[a:b] if b - a >= 3 else None
+                for a, b in zip(offsets, offsets[1:])
+            ]
+        else:
+            boxes, polys = [], []
+            for i, rev in enumerate(revs):
+                row = self.screen_rows.get(rev) or self.screen_row(i, view, offset_x, offset_y)
+                boxes.append(row[0])
+                polys.append(row[1])
+
+        self.screen_rows = dict(zip(revs, zip(boxes, polys)))
+        self.screen_view = view_key
+        self.screen_cache = (boxes, polys)
+        self.screen_key = (self.counter, view_key)
+        return self.screen_cache
+
+# =====================
+# SPATIAL INDEX
+# =====================
+class SpatialIndex:
+    """
+    Uniform grid over box extents and polygon vertices for hit-testing.
+    sync() re-indexes only the rows whose revision changed since the
+    last query.
+    """
+
+    def __init__(self, cell=GRID_CELL):
+        self.cell = cell
+        self.revs = []         # i -> indexed revision
+        self.keys = []         # i -> (extent cells, vertex cells)
+        self.box_cells = {}    # (cx, cy) -> {i}
+        self.vert_cells = {}   # (cx, cy) -> {i: [vertex idx]}
+        self.synced = None     # store.counter at the last sync
+
+    def cells(self, x0, y0, x1, y1):
+        c = self.cell
+        for cx in range(int(x0 // c), int(x1 // c) + 1):
+            for cy in range(int(y0 // c), int(y1 // c) + 1):
+                yield cx, cy
+
+    def add(self, i, store):
+        x, y, w, h = store.xywh[i].tolist()
+        poly = store.polygon(i)
+        x0, y0, x1, y1 = x, y, x + w, y + h
+
+        vkeys = set()
+        if len(poly):
+            lo, hi = poly.min(axis=0), poly.max(axis=0)
+            x0, y0 = min(x0, lo[0]), min(y0, lo[1])
+            x1, y1 = max(x1, hi[0]), max(y1, hi[1])
+
+            cells = np.floor(poly / self.cell).astype(np.int64).tolist()
+            for v, key in enumerate(map(tuple, cells)):
+                self.vert_cells.setdefault(key, {}).setdefault(i, []).append(v)
+                vkeys.add(key)
+
+        bkeys = list(self.cells(x0, y0, x1, y1))
+        for key in bkeys:
+            self.box_cells.setdefault(key, set()).add(i)
+
+        return bkeys, vkeys
+
+    def remove(self, i):
+        bkeys, vkeys = self.keys[i]
+        for key in bkeys:
+            cell = self.box_cells[key]
+            cell.discard(i)
+            if not cell:
+                del self.box_cells[key]
+        for key in vkeys:
+            cell = self.vert_cells[key]
+            cell.pop(i, None)
+            if not cell:
+                del self.vert_cells[key]
+
+    def sync(self, store):
+        if self.synced == store.counter:
+            return
+        self.synced = store.counter
+
+        while len(self.revs) > len(store):
+            self.remove(len(self.revs) - 1)
+            self.revs.pop()
+            self.keys.pop()
+
+        for i, rev in enumerate(store.rev.tolist()):
+            if i < len(self.revs):
+                if self.revs[i] == rev:
+                    continue
+                self.remove(i)
+                self.revs[i] = rev
+                self.keys[i] = self.add(i, store)
+            else:
+                self.revs.append(rev)
+                self.keys.append(self.add(i, store))
+
+    def boxes_at(self, store, x, y):
+        # candidate boxes whose extent cell contains (x, y), in list order
+        self.sync(store)
+        key = (int(x // self.cell), int(y // self.cell))
+        return sorted(self.box_cells.get(key, ()))
+
+    def vertex_at(self, store, x, y, r):
+        # {box idx: first vertex idx within r of (x, y)}
+        self.sync(store)
+        hits = {}
+        for key in self.cells(x - r, y - r, x + r, y + r):
+            for i, verts in self.vert_cells.get(key, {}).items():
+                poly = store.polygon(i)
+                for v in verts:
+                    vx, vy = poly[v]
+                    if abs(x - vx) < r and abs(y - vy) < r:
+                        hits[i] = min(v, hits.get(i, v))
+        return hits
+
+# =====================
+# TEXT CACHE
+# =====================
+text_cache = OrderedDict()    # (font, text, color) -> surface
+overlay_cache = {}            # size -> translucent background
+
+
+def render_text(font, text, color):
+    # font.render, but each string is rendered once
+    key = (font, text, color)
+    surf = text_cache.get(key)
+    if surf is None:
+        surf = font.render(text, True, color)
+        text_cache[key] = surf
+        if len(text_cache) > TEXT_CACHE_SIZE:
+            text_cache.popitem(last=False)
+    else:
+        text_cache.move_to_end(key)
+    return surf
+
 # =====================
 # COLOR GENERATOR
 # =====================
@@ -80,6 +568,17 @@ TOOLTIP_LINES = [
     "Images:",
     "  ← / →       : Prev / Next image",
     "  Alt + N     : Next image",
+    "  Alt + U     : Next unlabeled image",
+    "  Right click : Filter by class",
+    "  Alt + F     : Clear class filter",
+    "",
+    "Suggestions (model / previous frame):",
+    "  Alt + A     : Accept suggestions",
+    "  Alt + D     : Dismiss suggestions",
+    "",
+    "Video sequences:",
+    "  Alt + K     : Mark keyframe",
+    "  Alt + I     : Interpolate from keyframe",
     "",
     "Exit:",
     "  ESC         : Exit annotator",
@@ -100,33 +599,49 @@ def draw_tooltip(screen, font, visible, win_w, win_h):
     y = win_h - height - 10
 
     # background
-    s = pygame.Surface((width, height), pygame.SRCALPHA)
-    s.fill((0, 0, 0, 170))
+    s = overlay_cache.get((width, height))
+    if s is None:
+        s = pygame.Surface((width, height), pygame.SRCALPHA)
+        s.fill((0, 0, 0, 170))
+        overlay_cache[(width, height)] = s
     screen.blit(s, (x, y))
 
     # text
     ty = y + padding
     for line in TOOLTIP_LINES:
-        txt = font.render(line, True, (230, 230, 230))
+        txt = render_text(font, line, (230, 230, 230))
         screen.blit(txt, (x + padding, ty))
         ty += line_h
 
 
 def draw_class_list(screen, font, class_map, active_class_id,
-                    scroll, win_w, win_h):
-
-    click_areas = []
+                    scroll, win_w, win_h, counts=None, cache=None):
 
     sidebar_x = win_w - SIDEBAR_WIDTH
     area_top = 20
     area_height = win_h - 220   # พื้นที่สำหรับ class list
 
-    x = sidebar_x + 10
+    # pre-composed list, rebuilt only when what it shows (or where) changes;
+    # click / scrollbar rects are in screen coordinates, hence sidebar_x
+    key = (
+        tuple(class_map.items()), active_class_id, scroll, sidebar_x, win_h, font,
+        None if counts is None else tuple(counts.items())
+    )
+    if cache is not None and cache.get("key") == key:
+        surf, click_areas, scrollbar_rect, max_scroll = cache["list"]
+        screen.blit(surf, (sidebar_x, 0))
+        return click_areas, scrollbar_rect, max_scroll
+
+    surf = pygame.Surface((SIDEBAR_WIDTH, area_top + area_height + 24))
+    surf.fill((25, 25, 25))
+    click_areas = []
+
+    x = 10
     y = area_top - scroll
 
     # ===== Title =====
-    title = font.render("CLASSES", True, (255, 255, 255))
-    screen.blit(title, (x, area_top))
+    title = render_text(font, "CLASSES", (255, 255, 255))
+    surf.blit(title, (x, area_top))
 
     y += 30
 
@@ -135,12 +650,15 @@ def draw_class_list(screen, font, class_map, active_class_id,
 
         if y > area_top - 30 and y < area_top + area_height:
 
-            rect = pygame.Rect(x, y, SIDEBAR_WIDTH - 25, 22)
+            rect = pygame.Rect(sidebar_x + x, y, SIDEBAR_WIDTH - 25, 22)
             color = get_class_color(cid)
             prefix = "> " if cid == active_class_id else "  "
-            txt = font.render(f"{prefix}{cid}: {name}", True, color)
+            label = f"{prefix}{cid}: {name}"
+            if counts is not None:
+                label += f" ({counts.get(cid, 0)})"
+            txt = render_text(font, label, color)
 
-            screen.blit(txt, (x, y))
+            surf.blit(txt, (x, y))
             click_areas.append((rect, cid))
 
         y += 24
@@ -170,12 +688,17 @@ def draw_class_list(screen, font, class_map, active_class_id,
         )
 
         pygame.draw.rect(
-            screen,
+            surf,
             (120, 120, 120),
-            scrollbar_rect,
+            scrollbar_rect.move(-sidebar_x, 0),
             border_radius=4
         )
 
+    screen.blit(surf, (sidebar_x, 0))
+    if cache is not None:
+        cache["key"] = key
+        cache["list"] = (surf, click_areas, scrollbar_rect, max_scroll)
+
     return click_areas, scrollbar_rect, max_scroll
 
 def draw_button_scrollbar(screen, scroll, win_w, win_h, total_height):
@@ -220,15 +743,19 @@ def draw_class_menu(screen, font, menu):
         return []
 
     x, y = menu["pos"]
-    w, h = 120, 30
+    w, h = 120, 60
 
     pygame.draw.rect(screen, (40,40,40), (x, y, w, h))
     pygame.draw.rect(screen, (200,200,200), (x, y, w, h), 1)
 
     r = pygame.Rect(x, y, w, 30)
-    screen.blit(font.render("Delete", True, (255,255,255)), (x+10, y+6))
+    screen.blit(render_text(font, "Delete", (255,255,255)), (x+10, y+6))
+
+    f = pygame.Rect(x, y + 30, w, 30)
+    text = "Unfilter" if menu.get("filtered") else "Filter"
+    screen.blit(render_text(font, text, (255,255,255)), (x+10, y+36))
 
-    return [(r, "delete")]
+    return [(r, "delete"), (f, "filter")]
 
 def draw_confirm_popup(screen, font, data, win_w, win_h):
     if not data:
@@ -241,7 +768,7 @@ def draw_confirm_popup(screen, font, data, win_w, win_h):
     pygame.draw.rect(screen, (50,50,50), (x,y,w,h))
     pygame.draw.rect(screen, (220,220,220), (x,y,w,h), 2)
 
-    screen.blit(font.render("Delete this class?", True, (255,255,255)), (x+50, y+20))
+    screen.blit(render_text(font, "Delete this class?", (255,255,255)), (x+50, y+20))
 
     yes = pygame.Rect(x+40, y+70, 80, 30)
     no  = pygame.Rect(x+180, y+70, 80, 30)
@@ -249,8 +776,8 @@ def draw_confirm_popup(screen, font, data, win_w, win_h):
     pygame.draw.rect(screen, (200,50,50), yes)
     pygame.draw.rect(screen, (80,80,80), no)
 
-    screen.blit(font.render("Yes", True, (255,255,255)), (yes.x+25, yes.y+5))
-    screen.blit(font.render("No", True, (255,255,255)), (no.x+30, no.y+5))
+    screen.blit(render_text(font, "Yes", (255,255,255)), (yes.x+25, yes.y+5))
+    screen.blit(render_text(font, "No", (255,255,255)), (no.x+30, no.y+5))
 
     return [(yes,"yes"), (no,"no")]
 
@@ -265,7 +792,7 @@ def draw_exit_popup(screen, font, visible, win_w, win_h):
     pygame.draw.rect(screen, (50,50,50), (x,y,w,h))
     pygame.draw.rect(screen, (220,220,220), (x,y,w,h), 2)
 
-    screen.blit(font.render("Exit annotation tool?", True, (255,255,255)), (x+60, y+30))
+    screen.blit(render_text(font, "Exit annotation tool?", (255,255,255)), (x+60, y+30))
 
     yes = pygame.Rect(x+50, y+80, 90, 35)
     no  = pygame.Rect(x+180, y+80, 90, 35)
@@ -273,8 +800,8 @@ def draw_exit_popup(screen, font, visible, win_w, win_h):
     pygame.draw.rect(screen, (200,50,50), yes)
     pygame.draw.rect(screen, (80,80,80), no)
 
-    screen.blit(font.render("Yes", True, (255,255,255)), (yes.x+30, yes.y+8))
-    screen.blit(font.render("No", True, (255,255,255)), (no.x+35, no.y+8))
+    screen.blit(render_text(font, "Yes", (255,255,255)), (yes.x+30, yes.y+8))
+    screen.blit(render_text(font, "No", (255,255,255)), (no.x+35, no.y+8))
 
     return [(yes,"yes"), (no,"no")]
 
@@ -312,7 +839,7 @@ def draw_button(screen, font, rect, text, active=False, disabled=False):
         glow_rect = rect.inflate(6,6)
         pygame.draw.rect(screen,(100,180,255),glow_rect,2,border_radius=8)
 
-    text_surf = font.render(text,True,text_color)
+    text_surf = render_text(font, text, text_color)
 
     screen.blit(
         text_surf,
@@ -322,6 +849,15 @@ def draw_button(screen, font, rect, text, active=False, disabled=False):
         )
     )
 
+def event_region(event, win_w, win_h):
+    # screen area an event can change
+    sidebar = pygame.Rect(win_w - SIDEBAR_WIDTH, 0, SIDEBAR_WIDTH, win_h)
+    if event.type == pygame.MOUSEMOTION and not any(event.buttons):
+        return sidebar      # only button hover
+    if event.type == pygame.MOUSEWHEEL and sidebar.collidepoint(pygame.mouse.get_pos()):
+        return sidebar      # list scrolling
+    return pygame.Rect(0, 0, win_w, win_h)
+
 def write_data_yaml(dataset_dir: Path, class_map: dict):
     if not class_map:
         return
@@ -334,16 +870,1062 @@ def write_data_yaml(dataset_dir: Path, class_map: dict):
         "path": dataset_dir.as_posix(),
         "train": "images/train",
         "val": "images/val",
-        "nc": len(names),
-        "names": names,
     }
-
-    yaml_path = dataset_dir / "data.yaml"
-    yaml_path.write_text(
-        yaml.dump(data, sort_keys=False, allow_unicode=True),
-        encoding="utf-8"
+    if (dataset_dir / "images/test").is_dir():
+        data["test"] = "images/test"
+    data["nc"] = len(names)
+    data["names"] = names
+
+    write_atomic(
+        dataset_dir / "data.yaml",
+        yaml.dump(data, sort_keys=False, allow_unicode=True)
     )
 
+# =====================
+# RENDER CACHE
+# =====================
+class ZoomRenderCache:
+    """
+    Scaled copies of one image, cached per zoom level (LRU by pixel count).
+    Small zoom levels are scaled whole, big ones only around the viewport.
+    Scaling always starts from the nearest pyramid level (halvings of the
+    original) so a 4K+ image is never smoothscaled from full size.
+    """
+
+    def __init__(self, image):
+        self.levels = [image]
+        self.size = image.get_size()
+        self.entries = OrderedDict()   # (tw, th) -> (surface, rect in zoomed image)
+        self.pixels = 0
+
+    def poll(self):
+        # True when something new can be drawn (see TiledRenderCache)
+        return False
+
+    def level_for(self, tw, th):
+        # smallest pyramid level that is still >= the target size
+        i = 0
+        while True:
+            w, h = self.levels[i].get_size()
+            if w // 2 < tw or h // 2 < th or min(w, h) // 2 < PYRAMID_MIN_SIZE:
+                return self.levels[i]
+            if i + 1 == len(self.levels):
+                self.levels.append(
+                    pygame.transform.smoothscale(self.levels[i], (w // 2, h // 2))
+                )
+            i += 1
+
+    def draw(self, screen, size, offset, viewport):
+        tw, th = size
+        if tw < 1 or th < 1:
+            return
+
+        bx, by = int(offset[0]), int(offset[1])
+
+        # visible part of the zoomed image (zoomed image coordinates)
+        visible = viewport.move(-bx, -by).clip(pygame.Rect(0, 0, tw, th))
+        if visible.w == 0 or visible.h == 0:
+            return
+
+        key = (tw, th)
+        entry = self.entries.get(key)
+        if entry is None or not entry[1].contains(visible):
+            entry = self.render(tw, th, visible)
+            self.store(key, entry)
+        else:
+            self.entries.move_to_end(key)
+
+        surf, rect = entry
+        screen.blit(
+            surf,
+            (bx + visible.x, by + visible.y),
+            visible.move(-rect.x, -rect.y)
+        )
+
+    def render(self, tw, th, visible):
+        full = pygame.Rect(0, 0, tw, th)
+        if tw * th <= FULL_RENDER_PIXELS:
+            region = full
+        else:
+            region = visible.inflate(RENDER_MARGIN * 2, RENDER_MARGIN * 2).clip(full)
+
+        src = self.level_for(tw, th)
+        sw, sh = src.get_size()
+        fx, fy = sw / tw, sh / th
+
+        # source pixels covering the region, then snap the region to them
+        sx0, sy0 = int(region.x * fx), int(region.y * fy)
+        sx1 = min(sw, ceil(region.right * fx))
+        sy1 = min(sh, ceil(region.bottom * fy))
+        src_rect = pygame.Rect(sx0, sy0, max(1, sx1 - sx0), max(1, sy1 - sy0))
+
+        x0, y0 = round(sx0 / fx), round(sy0 / fy)
+        region = pygame.Rect(
+            x0, y0,
+            max(1, round(sx1 / fx) - x0),
+            max(1, round(sy1 / fy) - y0)
+        )
+
+        surf = pygame.transform.smoothscale(src.subsurface(src_rect), region.size)
+        return surf, region
+
+    def prepare(self, size):
+        # pre-scale a whole zoom level (used by the prefetch worker)
+        tw, th = size
+        self.store(size, self.render(tw, th, pygame.Rect(0, 0, tw, th)))
+
+    def nbytes(self):
+        levels = sum(s.get_width() * s.get_height() for s in self.levels)
+        return (levels + self.pixels) * 4
+
+    def store(self, key, entry):
+        old = self.entries.pop(key, None)
+        if old:
+            self.pixels -= old[1].w * old[1].h
+
+        self.entries[key] = entry
+        self.pixels += entry[1].w * entry[1].h
+
+        while self.pixels > RENDER_CACHE_PIXELS and len(self.entries) > 1:
+            _, (_, rect) = self.entries.popitem(last=False)
+            self.pixels -= rect.w * rect.h
+
+
+def is_large_image(path):
+    # header only - no pixels are decoded
+    try:
+        with open_large_image(path) as im:
+            w, h = im.size
+    except Exception:
+        return False
+    return w * h > TILED_MIN_PIXELS
+
+
+def trim_tile_disk(keep):
+    """
+    Delete the oldest decoded files over TILE_DISK_BYTES, never keep.
+    Files that cannot be deleted (mapped by an open image on Windows,
+    gone already) are skipped.
+    """
+    files = []
+    for p in TILE_DISK_DIR.glob("*.rgb"):
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        files.append((st.st_mtime, st.st_size, p))
+    files.sort()
+
+    total = sum(size for _, size, _ in files)
+    for _, size, p in files:
+        if total <= TILE_DISK_BYTES:
+            break
+        if p == keep:
+            continue
+        try:
+            p.unlink()
+        except OSError:
+            continue
+        total -= size
+
+
+detail_lock = threading.Lock()   # one full-resolution decode at a time
+
+
+class TiledRenderCache:
+    """
+    Render cache for very large images (same interface as ZoomRenderCache).
+    A reduced overview (JPEG draft decode) is shown right away. Zoomed in
+    past its resolution, the full image is decoded once in the background
+    into a memory-mapped RGB file and drawn from there tile by tile, with
+    an LRU of scaled tiles bounded by TILE_CACHE_BYTES.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+        with open_large_image(self.path) as im:
+            self.size = im.size
+            iw, ih = self.size
+            f = OVERVIEW_SIZE / max(iw, ih)
+            im.draft("RGB", (int(iw * f), int(ih * f)))
+            ov = im.convert("RGB")
+        ov.thumbnail((OVERVIEW_SIZE, OVERVIEW_SIZE))
+
+        overview = pygame.image.frombuffer(ov.tobytes(), ov.size, "RGB").convert()
+        self.overview = ZoomRenderCache(overview)
+        self.detail_scale = ov.size[0] / iw    # zoom the overview is sharp up to
+
+        self.pixels = None                     # (ih, iw, 3) memmap once decoded
+        self.decoding = False
+        self.retry_at = 0.0                    # monotonic time a failed decode may rerun
+        self.new_detail = False
+        self.tiles = OrderedDict()             # (tx, ty, w, h) -> scaled tile
+        self.tile_bytes = 0
+
+    def disk_path(self):
+        st = self.path.stat()
+        key = f"{self.path.resolve()}|{st.st_size}|{st.st_mtime_ns}"
+        return TILE_DISK_DIR / (hashlib.sha1(key.encode("utf-8")).hexdigest()[:20] + ".rgb")
+
+    def decode(self):
+        iw, ih = self.size
+        path = self.disk_path()
+        try:
+            with detail_lock:
+                if not path.exists():
+                    TILE_DISK_DIR.mkdir(parents=True, exist_ok=True)
+                    tmp = temp_path(path)
+                    with open_large_image(self.path) as im:
+                        im = im if im.mode == "RGB" else im.convert("RGB")
+                        out = np.memmap(tmp, dtype=np.uint8, mode="w+", shape=(ih, iw, 3))
+                        for y in range(0, ih, TILE_SIZE):
+                            strip = im.crop((0, y, iw, min(ih, y + TILE_SIZE)))
+                            out[y:y + TILE_SIZE] = np.asarray(strip)
+                        out.flush()
+                        del out
+                    os.replace(tmp, path)
+                    trim_tile_disk(keep=path)
+            self.pixels = np.memmap(path, dtype=np.uint8, mode="r", shape=(ih, iw, 3))
+            self.new_detail = True
+        except Exception as e:
+            print(f"Full resolution decode failed {self.path}: {e}")
+            self.retry_at = time.monotonic() + DECODE_RETRY
+            self.decoding = False
+
+    def poll(self):
+        new, self.new_detail = self.new_detail, False
+        return new
+
+    def draw(self, screen, size, offset, viewport):
+        tw, th = size
+        view = tw / self.size[0]
+
+        if view <= self.detail_scale or self.pixels is None:
+            if view > self.detail_scale and not self.decoding and time.monotonic() >= self.retry_at:
+                self.decoding = True
+                threading.Thread(target=self.decode, daemon=True).start()
+            self.overview.draw(screen, size, offset, viewport)
+            return
+
+        bx, by = int(offset[0]), int(offset[1])
+        visible = viewport.move(-bx, -by).clip(pygame.Rect(0, 0, tw, th))
+        if visible.w == 0 or visible.h == 0:
+            return
+
+        # full-resolution tiles under the viewport
+        iw, ih = self.size
+        tx0 = int(visible.x / view) // TILE_SIZE
+        ty0 = int(visible.y / view) // TILE_SIZE
+        tx1 = min(ceil(visible.right / view / TILE_SIZE), ceil(iw / TILE_SIZE))
+        ty1 = min(ceil(visible.bottom / view / TILE_SIZE), ceil(ih / TILE_SIZE))
+
+        for ty in range(ty0, ty1):
+            for tx in range(tx0, tx1):
+                x0, y0 = tx * TILE_SIZE, ty * TILE_SIZE
+                sx0, sy0 = round(x0 * view), round(y0 * view)
+                sx1 = round(min(iw, x0 + TILE_SIZE) * view)
+                sy1 = round(min(ih, y0 + TILE_SIZE) * view)
+                if sx1 > sx0 and sy1 > sy0:
+                    surf = self.tile(tx, ty, sx1 - sx0, sy1 - sy0)
+                    screen.blit(surf, (bx + sx0, by + sy0))
+
+    def tile(self, tx, ty, w, h):
+        key = (tx, ty, w, h)
+        surf = self.tiles.get(key)
+        if surf is not None:
+            self.tiles.move_to_end(key)
+            return surf
+
+        x0, y0 = tx * TILE_SIZE, ty * TILE_SIZE
+        block = np.ascontiguousarray(self.pixels[y0:y0 + TILE_SIZE, x0:x0 + TILE_SIZE])
+        src = pygame.image.frombuffer(block, (block.shape[1], block.shape[0]), "RGB")
+        surf = pygame.transform.smoothscale(src, (w, h))
+
+        self.tiles[key] = surf
+        self.tile_bytes += w * h * surf.get_bytesize()
+        while self.tile_bytes > TILE_CACHE_BYTES and len(self.tiles) > 1:
+            _, old = self.tiles.popitem(last=False)
+            self.tile_bytes -= old.get_width() * old.get_height() * old.get_bytesize()
+        return surf
+
+    def prepare(self, size):
+        self.overview.prepare(size)
+
+    def nbytes(self):
+        return self.overview.nbytes() + self.tile_bytes
+
+# =====================
+# UNDO / REDO
+# =====================
+# Commands hold AnnotationStore records (x, y, w, h, cid, poly | None):
+#   ("add", i, box)            box inserted at i
+#   ("delete", i, box)         box removed from i
+#   ("replace", i, old, new)   move / resize / vertex drag / relabel
+#   ("set", old_list, new_list)
+def apply_command(store, cmd, undo=False):
+    kind = cmd[0]
+
+    if kind == "add":
+        _, i, box = cmd
+        if undo:
+            store.delete(i)
+        else:
+            store.insert(i, box)
+
+    elif kind == "delete":
+        _, i, box = cmd
+        if undo:
+            store.insert(i, box)
+        else:
+            store.delete(i)
+
+    elif kind == "replace":
+        _, i, old, new = cmd
+        store.replace(i, old if undo else new)
+
+    elif kind == "set":
+        _, old, new = cmd
+        store.set_records(old if undo else new)
+
+
+def box_nbytes(box):
+    poly = box[5]
+    return 120 + (poly.nbytes if poly is not None else 0)
+
+
+def command_nbytes(cmd):
+    if cmd[0] == "set":
+        return 64 + sum(box_nbytes(b) for b in cmd[1]) + sum(box_nbytes(b) for b in cmd[2])
+    return 64 + sum(box_nbytes(b) for b in cmd[2:])
+
+
+class UndoHistory:
+    """
+    Operation log of one image. Stores small commands instead of
+    snapshots of every box; the oldest ones are dropped past UNDO_MAX_BYTES
+    (nbytes counts both stacks).
+    """
+
+    def __init__(self):
+        self.undo_stack = []
+        self.redo_stack = []
+        self.nbytes = 0
+        self.mergeable = False
+
+    def push(self, cmd, merge=False):
+        # merge=True folds repeated edits of the same box (e.g. holding
+        # UP to relabel) into one step
+        top = self.undo_stack[-1] if self.undo_stack else None
+        if merge and self.mergeable and top[0] == "replace" == cmd[0] and top[1] == cmd[1]:
+            self.undo_stack.pop()
+            self.nbytes -= command_nbytes(top)
+            cmd = ("replace", cmd[1], top[2], cmd[3])
+
+        self.undo_stack.append(cmd)
+        self.mergeable = merge
+        self.nbytes += command_nbytes(cmd)
+
+        for old in self.redo_stack:
+            self.nbytes -= command_nbytes(old)
+        self.redo_stack.clear()
+
+        while self.nbytes > UNDO_MAX_BYTES and len(self.undo_stack) > 1:
+            self.nbytes -= command_nbytes(self.undo_stack.pop(0))
+
+    def undo(self, store):
+        if not self.undo_stack:
+            return False
+        cmd = self.undo_stack.pop()
+        self.mergeable = False
+        apply_command(store, cmd, undo=True)
+        self.redo_stack.append(cmd)
+        return True
+
+    def redo(self, store):
+        if not self.redo_stack:
+            return False
+        cmd = self.redo_stack.pop()
+        self.mergeable = False
+        apply_command(store, cmd)
+        self.undo_stack.append(cmd)
+        return True
+
+
+def trim_undo_histories(histories):
+    # histories: OrderedDict path -> UndoHistory, most recent last
+    total = sum(h.nbytes for h in histories.values())
+    while total > UNDO_SESSION_BYTES and len(histories) > 1:
+        _, old = histories.popitem(last=False)
+        total -= old.nbytes
+
+# =====================
+# PREFETCH
+# =====================
+class ImagePrefetcher:
+    """
+    Decodes the images around the cursor in a worker thread.
+    Keeps an LRU of ready-to-blit render caches (ZoomRenderCache, or
+    TiledRenderCache for very large images) plus the raw label text,
+    bounded by PREFETCH_CACHE_BYTES.
+    """
+
+    def __init__(self, image_paths, labels_dir):
+        self.image_paths = image_paths
+        self.labels_dir = labels_dir
+
+        self.entries = OrderedDict()   # idx -> (render_cache, label_src)
+        self.sizes = {}
+        self.nbytes = 0
+
+        self.pending = []              # nearest first
+        self.loading = None
+        self.closed = False
+        self.cond = threading.Condition()
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def load(self, idx):
+        img_path = Path(self.image_paths[idx])
+        label_file = self.labels_dir / f"{img_path.stem}.txt"
+
+        if Image is not None and is_large_image(img_path):
+            render_cache = TiledRenderCache(img_path)
+        else:
+            image = pygame.image.load(str(img_path)).convert_alpha()
+            render_cache = ZoomRenderCache(image)
+
+        iw, ih = render_cache.size
+        scale = min(IMG_WIDTH / iw, IMG_HEIGHT / ih)
+        render_cache.prepare((int(iw * scale), int(ih * scale)))
+
+        label_src = label_file.read_text() if label_file.exists() else None
+        return render_cache, label_src
+
+    def get(self, idx):
+        with self.cond:
+            while self.loading == idx:
+                self.cond.wait()
+            entry = self.entries.get(idx)
+            if entry:
+                self.entries.move_to_end(idx)
+
+        # not prefetched (first image / long jump) -> load here
+        if entry is None:
+            entry = self.load(idx)
+            with self.cond:
+                self.store(idx, entry)
+
+        return entry
+
+    def prefetch(self, idx):
+        order = []
+        for d in range(1, PREFETCH_RADIUS + 1):
+            order += [idx + d, idx - d]
+
+        with self.cond:
+            self.pending = [
+                i for i in order
+                if 0 <= i < len(self.image_paths) and i not in self.entries
+            ]
+            self.trim()
+            self.cond.notify_all()
+
+    def label(self, idx):
+        # label text of an image, from the cache when it is there
+        with self.cond:
+            entry = self.entries.get(idx)
+        if entry:
+            return entry[1]
+        label_file = self.labels_dir / f"{Path(self.image_paths[idx]).stem}.txt"
+        return label_file.read_text() if label_file.exists() else None
+
+    def update_label(self, idx, label_src):
+        with self.cond:
+            if idx in self.entries:
+                self.entries[idx] = (self.entries[idx][0], label_src)
+
+    def reload_labels(self):
+        # label files changed on disk (dataset-wide remap)
+        with self.cond:
+            for idx, (render_cache, _) in self.entries.items():
+                label_file = self.labels_dir / f"{Path(self.image_paths[idx]).stem}.txt"
+                label_src = label_file.read_text() if label_file.exists() else None
+                self.entries[idx] = (render_cache, label_src)
+
+    def store(self, idx, entry):
+        if idx in self.entries:
+            self.nbytes -= self.sizes.pop(idx)
+            del self.entries[idx]
+
+        self.entries[idx] = entry
+        self.sizes[idx] = entry[0].nbytes()
+        self.nbytes += self.sizes[idx]
+        self.trim()
+
+    def trim(self):
+        # render caches grow while their image is viewed (zoom levels,
+        # tiles): measure them again before evicting
+        for idx, (render_cache, _) in self.entries.items():
+            self.sizes[idx] = render_cache.nbytes()
+        self.nbytes = sum(self.sizes.values())
+
+        while self.nbytes > PREFETCH_CACHE_BYTES and len(self.entries) > 1:
+            old, _ = self.entries.popitem(last=False)
+            self.nbytes -= self.sizes.pop(old)
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                idx = self.pending.pop(0)
+                if idx in self.entries:
+                    continue
+                self.loading = idx
+
+            try:
+                entry = self.load(idx)
+            except Exception as e:
+                print(f"Prefetch failed {self.image_paths[idx]}: {e}")
+                entry = None
+
+            with self.cond:
+                self.loading = None
+                if entry:
+                    self.store(idx, entry)
+                self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+# =====================
+# AUTOSAVE
+# =====================
+def file_stamp(path):
+    # [mtime_ns, size], None if missing
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def read_text(path):
+    try:
+        return path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+
+
+class LabelWriter:
+    """
+    Background label writer.
+    stage() journals the new text right away (append-only JSON lines) and
+    writes the label file AUTOSAVE_DELAY later, so a burst of edits is one
+    write. The journal is removed once everything is on disk; if the
+    session dies first, recover() replays it on the next start.
+    Each session has its own journal, locked while the session lives, so
+    other sessions on the same dataset never replay it under its feet.
+    Entries carry the label file's stamp before the write and the class
+    map they were made with, so recovery never replays over a file or
+    class ids changed since.
+    """
+
+    def __init__(self, labels_dir, class_map=None):
+        self.class_map = class_map     # the registry's, followed in place
+        self.journaled_classes = None
+        session = f"{os.getpid()}.{uuid.uuid4().hex[:8]}"
+        self.journal_path = labels_dir / JOURNAL_NAME.format(session)
+        self.owner = ExitStack()
+        self.owner.enter_context(load_node("class_registry").file_lock(self.journal_path))
+        self.pending = {}       # label file -> (due time, text)
+        self.to_journal = []
+        self.written = []       # label files on disk since take_written()
+        self.busy = False
+        self.failed = False
+        self.closed = False
+        self.cond = threading.Condition()
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def recover(labels_dir, class_map=None):
+        # journals of dead sessions only (their lock is free), oldest first
+        file_lock = load_node("class_registry").file_lock
+        journals = sorted(labels_dir.glob(JOURNAL_NAME.format("*")), key=lambda p: p.stat().st_mtime_ns)
+        journals += [p for p in [labels_dir / ".autosave_journal.jsonl"] if p.exists()]   # older versions
+
+        recovered = 0
+        for journal_path in journals:
+            try:
+                with file_lock(journal_path, timeout=0):
+                    if not journal_path.exists():
+                        continue    # finished while we looked
+                    recovered += LabelWriter.replay(journal_path, labels_dir, class_map)
+            except TimeoutError:
+                continue    # session still running
+            Path(str(journal_path) + ".lock").unlink(missing_ok=True)
+        return recovered
+
+    @staticmethod
+    def replay(journal_path, labels_dir, class_map=None):
+        """
+        Write the last journaled text of each label file, unless the file
+        changed on disk since (another session) or the class ids of the
+        text mean something else now (classes deleted / renumbered).
+        Skipped entries are reported and their journal kept as .rejected.
+        """
+        latest = {}      # file -> (text, class map it was made with)
+        seen = {}        # file -> (stamps before our writes, our texts)
+        classes = None
+        for line in journal_path.read_text(encoding="utf-8").splitlines():
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue    # torn last line
+            if "file" not in rec:
+                classes = rec["classes"]
+                continue
+            latest[rec["file"]] = (rec["text"], classes)
+            stamps, texts = seen.setdefault(rec["file"], (set(), set()))
+            base = rec.get("base", "any")      # older journals: no stamp, trusted
+            stamps.add(tuple(base) if isinstance(base, list) else base)
+            texts.add(rec["text"])
+
+        rejected = []
+        for name, (text, classes) in latest.items():
+            path = labels_dir / name
+            stamps, texts = seen[name]
+            current = file_stamp(path)
+            current = tuple(current) if current else None
+            # ours: still as before our writes, or holding one of our texts
+            if "any" not in stamps and current not in stamps and read_text(path) not in texts:
+                rejected.append((name, "label file changed since"))
+                continue
+            if class_map is not None and classes is not None:
+                names = {cid: n for n, cid in classes.items()}
+                used = {int(float(l.split()[0])) for l in text.splitlines() if l.strip()}
+                if any(class_map.get(names.get(cid)) != cid for cid in used):
+                    rejected.append((name, "class ids changed since"))
+                    continue
+            write_atomic(path, text)
+
+        for name, reason in rejected:
+            print(f"Autosave journal: {name} not recovered ({reason})")
+        if rejected:
+            os.replace(journal_path, journal_path.with_suffix(".rejected"))
+        else:
+            journal_path.unlink()
+        return len(latest) - len(rejected)
+
+    def stage(self, label_file, text, delay=AUTOSAVE_DELAY):
+        classes = dict(self.class_map) if self.class_map is not None else None
+        with self.cond:
+            self.pending[label_file] = (time.monotonic() + delay, text)
+            self.to_journal.append((label_file, text, classes))
+            self.cond.notify_all()
+
+    def due(self):
+        now = time.monotonic()
+        return [p for p, (t, _) in self.pending.items() if self.closed or t <= now]
+
+    def wait_time(self):
+        if not self.pending:
+            return None
+        return max(0.0, min(t for t, _ in self.pending.values()) - time.monotonic())
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not (self.to_journal or self.due() or self.closed):
+                    self.cond.wait(self.wait_time())
+                if self.closed and not self.pending and not self.to_journal:
+                    return
+
+                journal, self.to_journal = self.to_journal, []
+                jobs = [(p, self.pending.pop(p)[1]) for p in self.due()]
+                self.busy = True
+
+            if journal:
+                with open(self.journal_path, "a", encoding="utf-8") as f:
+                    for path, text, classes in journal:
+                        if classes != self.journaled_classes:
+                            self.journaled_classes = classes
+                            f.write(json.dumps({"classes": classes}, ensure_ascii=False) + "\n")
+                        rec = {"file": path.name, "text": text, "base": file_stamp(path)}
+                        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            done = []
+            for path, text in jobs:
+                try:
+                    write_atomic(path, text)
+                    done.append(path)
+                except OSError as e:
+                    print(f"Autosave failed {path}: {e}")
+                    self.failed = True
+
+            with self.cond:
+                self.written += done
+                # everything on disk -> journal no longer needed
+                if not self.pending and not self.to_journal and not self.failed:
+                    self.journal_path.unlink(missing_ok=True)
+                self.busy = False
+                self.cond.notify_all()
+
+    def expedite(self, label_file):
+        # leaving the image -> write now instead of after the debounce
+        with self.cond:
+            if label_file in self.pending:
+                self.pending[label_file] = (0.0, self.pending[label_file][1])
+                self.cond.notify_all()
+
+    def discard(self, label_file):
+        # drop a write that is not on disk yet; True if there was one
+        with self.cond:
+            return self.pending.pop(label_file, None) is not None
+
+    def take_written(self):
+        with self.cond:
+            written, self.written = self.written, []
+        return written
+
+    def flush(self):
+        # write everything pending now and wait until it is on disk
+        with self.cond:
+            for p, (_, text) in self.pending.items():
+                self.pending[p] = (0.0, text)
+            self.cond.notify_all()
+            while self.pending or self.to_journal or self.busy:
+                self.cond.wait()
+
+    def close(self):
+        # flush everything that is pending, then stop
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join()
+        self.owner.close()
+        if not self.journal_path.exists():
+            Path(str(self.journal_path) + ".lock").unlink(missing_ok=True)
+
+# =====================
+# SUGGESTIONS
+# =====================
+class SuggestionWorker:
+    """
+    Runs a YOLO model (CPU, batched) on the upcoming unlabeled images in a
+    background thread. Suggestions are (x, y, w, h, class name, polygon|None)
+    in image pixels; names are mapped to class ids only when shown, so a
+    class map edited meanwhile is still honoured.
+    """
+
+    def __init__(self, model_path, image_paths, conf):
+        self.model_path = Path(model_path)
+        self.image_paths = image_paths
+        self.conf = conf
+
+        self.results = {}      # img idx -> suggestions
+        self.pending = []
+        self.failed = False
+        self.closed = False
+        self.cond = threading.Condition()
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def request(self, indices):
+        # current image first, then the ones ahead
+        with self.cond:
+            self.pending = [i for i in indices if i not in self.results]
+            self.cond.notify_all()
+
+    def get(self, idx):
+        # None -> not predicted (yet)
+        with self.cond:
+            return self.results.get(idx)
+
+    @staticmethod
+    def to_suggestions(result):
+        names = result.names
+        xyxy = result.boxes.xyxy.cpu().numpy()
+        cls = result.boxes.cls.cpu().numpy().astype(int)
+        polys = result.masks.xy if result.masks is not None else [None] * len(cls)
+
+        out = []
+        for (x1, y1, x2, y2), c, poly in zip(xyxy, cls, polys):
+            if poly is not None and len(poly) < 3:
+                poly = None
+            if poly is not None:
+                poly = simplify_polygon(poly)
+            out.append((
+                float(x1), float(y1), float(x2 - x1), float(y2 - y1),
+                names[int(c)],
+                None if poly is None else np.asarray(poly, dtype=float)
+            ))
+        return out
+
+    def run(self):
+        try:
+            from ultralytics import YOLO
+            model = YOLO(str(self.model_path))
+        except Exception as e:
+            print(f"Suggestions disabled: {e}")
+            self.failed = True
+            return
+
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                batch = self.pending[:SUGGEST_BATCH]
+                del self.pending[:SUGGEST_BATCH]
+
+            try:
+                preds = model.predict(
+                    [str(self.image_paths[i]) for i in batch],
+                    device="cpu",
+                    conf=self.conf,
+                    verbose=False,
+                )
+                found = {i: self.to_suggestions(r) for i, r in zip(batch, preds)}
+            except Exception as e:
+                print(f"Suggestion failed: {e}")
+                found = {i: [] for i in batch}
+
+            with self.cond:
+                self.results.update(found)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+# =====================
+# PROPAGATION / INTERPOLATION
+# =====================
+def load_gray(path):
+    """
+    Grayscale frame (uint8, long side <= PROPAGATE_SIZE) and the
+    (x, y) factor from its pixels to image pixels.
+    """
+    if Image is not None:
+        with open_large_image(path) as im:
+            iw, ih = im.size
+            im.draft("L", (PROPAGATE_SIZE, PROPAGATE_SIZE))
+            im = im.convert("L")
+            im.thumbnail((PROPAGATE_SIZE, PROPAGATE_SIZE))
+            gray = np.ascontiguousarray(np.asarray(im))
+    else:
+        surf = pygame.image.load(str(path)).convert()
+        iw, ih = surf.get_size()
+        f = min(1.0, PROPAGATE_SIZE / max(iw, ih))
+        surf = pygame.transform.smoothscale(surf, (max(1, int(iw * f)), max(1, int(ih * f))))
+        gray = pygame.surfarray.array3d(surf).mean(axis=2).T.astype(np.uint8)
+
+    return gray, (iw / gray.shape[1], ih / gray.shape[0])
+
+
+def match_block(prev, cur, box, radius=PROPAGATE_SEARCH):
+    """
+    Shift (dx, dy) of one box between two frames by exhaustive block
+    matching (mean squared difference) within +-radius. The template is
+    subsampled to ~32 px; flat regions keep the zero shift.
+    """
+    x, y, w, h = box
+    fh, fw = prev.shape
+    x0, y0 = max(0, int(x)), max(0, int(y))
+    x1, y1 = min(fw, int(x + w) + 1), min(fh, int(y + h) + 1)
+    if x1 - x0 < 4 or y1 - y0 < 4:
+        return None
+
+    s = max(1, ceil(max(x1 - x0, y1 - y0) / 32))
+    tpl = prev[y0:y1:s, x0:x1:s].astype(np.float32)
+
+    sx0, sy0 = max(0, x0 - radius), max(0, y0 - radius)
+    sx1, sy1 = min(fw, x1 + radius), min(fh, y1 + radius)
+    area = cur[sy0:sy1, sx0:sx1].astype(np.float32)
+    windows = np.lib.stride_tricks.sliding_window_view(area, (y1 - y0, x1 - x0))[:, :, ::s, ::s]
+    cost = ((windows - tpl) ** 2).mean(axis=(2, 3))
+
+    iy, ix = np.unravel_index(np.argmin(cost), cost.shape)
+    if cost[y0 - sy0, x0 - sx0] <= cost[iy, ix] + 1e-3:
+        return 0.0, 0.0
+    return float(sx0 + ix - x0), float(sy0 + iy - y0)
+
+
+def track_boxes(prev, cur, boxes):
+    """
+    Shift (dx, dy) of each box (frame pixels) from prev to cur, None when
+    lost: median Lucas-Kanade motion of the corners inside the box,
+    forward-backward checked (OpenCV), else block matching.
+    """
+    if cv2 is None:
+        return [match_block(prev, cur, b) for b in boxes]
+
+    out = []
+    for box in boxes:
+        x, y, w, h = box
+        mask = np.zeros_like(prev)
+        mask[max(0, int(y)):max(0, int(y + h) + 1), max(0, int(x)):max(0, int(x + w) + 1)] = 255
+        pts = cv2.goodFeaturesToTrack(prev, 40, 0.01, 3, mask=mask)
+        if pts is None or len(pts) < PROPAGATE_MIN_POINTS:
+            out.append(match_block(prev, cur, box))
+            continue
+
+        nxt, ok, _ = cv2.calcOpticalFlowPyrLK(prev, cur, pts, None, winSize=(21, 21), maxLevel=3)
+        back, ok_back, _ = cv2.calcOpticalFlowPyrLK(cur, prev, nxt, None, winSize=(21, 21), maxLevel=3)
+        good = (ok.ravel() == 1) & (ok_back.ravel() == 1) & (
+            np.linalg.norm((back - pts).reshape(-1, 2), axis=1) < 1.0
+        )
+        if good.sum() < PROPAGATE_MIN_POINTS:
+            out.append(match_block(prev, cur, box))
+            continue
+
+        dx, dy = np.median((nxt - pts).reshape(-1, 2)[good], axis=0)
+        out.append((float(dx), float(dy)))
+    return out
+
+
+class PropagationWorker:
+    """
+    Moves the labels of the previous frame onto the current one (video
+    frame sequences) in a background thread. Results are suggestions like
+    SuggestionWorker's; only the latest request is worked on.
+    """
+
+    def __init__(self, image_paths):
+        self.image_paths = image_paths
+
+        self.results = {}      # img idx -> suggestions
+        self.job = None
+        self.grays = OrderedDict()
+        self.closed = False
+        self.cond = threading.Condition()
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def request(self, idx, prev_idx, records, names):
+        # records of prev_idx in image pixels, names: class id -> name
+        with self.cond:
+            self.results.pop(idx, None)
+            self.job = (idx, prev_idx, records, names)
+            self.cond.notify_all()
+
+    def get(self, idx):
+        # None -> not propagated (yet)
+        with self.cond:
+            return self.results.get(idx)
+
+    def gray(self, idx):
+        # the current frame is the previous one of the next request
+        if idx not in self.grays:
+            self.grays[idx] = load_gray(self.image_paths[idx])
+            while len(self.grays) > 3:
+                self.grays.popitem(last=False)
+        return self.grays[idx]
+
+    def propagate(self, idx, prev_idx, records, names):
+        prev, _ = self.gray(prev_idx)
+        cur, (fx, fy) = self.gray(idx)
+        if prev.shape != cur.shape:
+            return []    # not the same sequence
+
+        boxes = [(x / fx, y / fy, w / fx, h / fy) for x, y, w, h, _, _ in records]
+        out = []
+        for (x, y, w, h, cid, poly), shift in zip(records, track_boxes(prev, cur, boxes)):
+            if shift is None or cid not in names:
+                continue
+            dx, dy = shift[0] * fx, shift[1] * fy
+            out.append((
+                x + dx, y + dy, w, h, names[cid],
+                None if poly is None else poly + (dx, dy)
+            ))
+        return out
+
+    def run(self):
+        while True:
+            with self.cond:
+                while self.job is None and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                job, self.job = self.job, None
+
+            try:
+                found = self.propagate(*job)
+            except Exception as e:
+                print(f"Propagation failed: {e}")
+                found = []
+
+            with self.cond:
+                self.results[job[0]] = found
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+def match_records(a, b):
+    """
+    Pair the boxes of two keyframes: same class, nearest centers first.
+    Returns [(i, j)]; boxes without a partner are left out.
+    """
+    pairs = []
+    for cid in {r[4] for r in a} & {r[4] for r in b}:
+        ia = [i for i, r in enumerate(a) if r[4] == cid]
+        jb = [j for j, r in enumerate(b) if r[4] == cid]
+        ca = np.array([(a[i][0] + a[i][2] / 2, a[i][1] + a[i][3] / 2) for i in ia])
+        cb = np.array([(b[j][0] + b[j][2] / 2, b[j][1] + b[j][3] / 2) for j in jb])
+        dist = np.linalg.norm(ca[:, None] - cb[None], axis=2)
+
+        used_a, used_b = set(), set()
+        for k in np.argsort(dist, axis=None):
+            i, j = np.unravel_index(k, dist.shape)
+            if i in used_a or j in used_b:
+                continue
+            used_a.add(i)
+            used_b.add(j)
+            pairs.append((ia[i], jb[j]))
+    return sorted(pairs)
+
+
+def interpolate_records(a, b, pairs, t):
+    # records at t in [0, 1] between keyframe records a and b
+    out = []
+    for i, j in pairs:
+        box_a, box_b = np.array(a[i][:4]), np.array(b[j][:4])
+        x, y, w, h = (box_a + (box_b - box_a) * t).tolist()
+        poly_a, poly_b = a[i][5], b[j][5]
+
+        if poly_a is not None and poly_b is not None and len(poly_a) == len(poly_b):
+            poly = poly_a + (poly_b - poly_a) * t
+        elif poly_a is not None or poly_b is not None:
+            # vertex counts differ: the nearer keyframe's polygon, fitted to the box
+            use_a = poly_b is None or (poly_a is not None and t < 0.5)
+            src, (sx, sy, sw, sh) = (poly_a, a[i][:4]) if use_a else (poly_b, b[j][:4])
+            poly = (x, y) + (src - (sx, sy)) * (w / sw if sw else 1.0, h / sh if sh else 1.0)
+        else:
+            poly = None
+
+        if poly is not None:
+            x, y = poly.min(axis=0).tolist()
+            w, h = (poly.max(axis=0) - (x, y)).tolist()
+        out.append((x, y, w, h, a[i][4], poly))
+    return out
+
 # =====================
 # MAIN TOOL
 # =====================
@@ -361,8 +1943,19 @@ def annotate_images_pygame(
         "label":"Project folder (shared classes)",
     }="C:/",
     split: str = "train",
+
+    model_path: {
+        "widget_name":"path_preview",
+        "type":str,
+        "label":"YOLO model for suggestions (.pt, optional)",
+    }="",
+    suggest_conf: float = 0.25,
+    simplify_on_save: bool = False,
+    propagate_labels: bool = True,
 ):
 
+    # lazy batches (load_images_from_folder): navigation needs the whole list
+    image_paths = list(load_node("prepare_images_for_yolo").iter_images(image_paths))
     if not image_paths:
         return "No images to label"
 
@@ -373,16 +1966,26 @@ def annotate_images_pygame(
     project_dir = Path(project_dir)
     project_dir.mkdir(parents=True, exist_ok=True)
 
-    class_map_path = project_dir / "classes.json"
-    class_map = json.loads(class_map_path.read_text(encoding="utf-8")) if class_map_path.exists() else {}
+    # classes.json is shared with other sessions: changes under its lock,
+    # class_map follows the file (updated in place by the registry)
+    registry = load_node("class_registry").ClassRegistry(project_dir)
+    class_map = registry.class_map
+
+    # work of a session that died before its labels were written
+    recovered = LabelWriter.recover(labels_dir, class_map)
+    if recovered:
+        print(f"Recovered {recovered} label files from the autosave journal")
 
     def get_class_id(name):
         if name not in class_map:
-            class_map[name] = len(class_map)
-            class_map_path.write_text(
-                json.dumps(class_map, indent=2, ensure_ascii=False),
-                encoding="utf-8"
-            )
+            with registry.locked():
+                # ids changed elsewhere: move this image onto them before
+                # handing out an id (follow_classes is the current image's)
+                before = registry.refresh()
+                if before is not None:
+                    follow_classes(before)
+                registry.add(name)
+                write_data_yaml(dataset_dir, class_map)
         return class_map[name]
 
     pygame.init()
@@ -403,16 +2006,90 @@ def annotate_images_pygame(
     active_class_id = 0
     show_help = True
 
+    prefetcher = ImagePrefetcher(image_paths, labels_dir)
+    writer = LabelWriter(labels_dir, class_map)
+    undo_histories = OrderedDict()   # img path -> UndoHistory (whole session)
+    remap = load_node("remap_dataset_classes")
+
+    # ===== LABEL INDEX (class counts / navigation) =====
+    label_index = load_node("index_dataset_labels")
+    index_conn = label_index.open_label_index(dataset_dir)
+    label_index.refresh_label_index(index_conn, dataset_dir)
+    label_names = [f"{Path(p).stem}.txt" for p in image_paths]
+    label_name_counts = Counter(label_names)
+    index_stats = {}
+    class_filter = None
+    class_list_cache = {}
+
+    def sync_index():
+        # autosaved files -> index; cached stats follow each file's old / new counts
+        written = writer.take_written()
+        for path in written:
+            before, after = label_index.update_label_file(index_conn, split, path)
+            if index_stats:
+                move_index_stats(Path(path).name, before, after)
+        if written:
+            index_conn.commit()
+        if index_stats:
+            return bool(written)
+
+        # first call, or after changes outside the writer: full rebuild
+        labeled = label_index.labeled_files(index_conn, split)
+        index_stats["labeled"] = labeled
+        index_stats["n_labeled"] = sum(name in labeled for name in label_names)
+        index_stats["counts"] = label_index.class_counts(index_conn, split)
+        return True
+
+    def move_index_stats(name, before, after):
+        counts = index_stats["counts"]
+        for cid, n in before.items():
+            counts[cid] = counts.get(cid, 0) - n
+            if counts[cid] <= 0:
+                del counts[cid]
+        for cid, n in after.items():
+            counts[cid] = counts.get(cid, 0) + n
+
+        labeled = index_stats["labeled"]
+        if bool(after) != (name in labeled):
+            if after:
+                labeled.add(name)
+            else:
+                labeled.discard(name)
+            index_stats["n_labeled"] += label_name_counts[name] * (1 if after else -1)
+
+    def find_image(start, step, names, present):
+        # first image from start whose label file is (not) in names
+        i = start
+        while 0 <= i < len(label_names) and (label_names[i] in names) != present:
+            i += step
+        return i
+
+    sync_index()
+
+    # ===== MODEL SUGGESTIONS (optional) =====
+    suggester = None
+    if model_path and Path(model_path).is_file():
+        suggester = SuggestionWorker(model_path, image_paths, suggest_conf)
+
+    # ===== VIDEO SEQUENCES (propagation / keyframes) =====
+    propagator = PropagationWorker(image_paths) if propagate_labels else None
+    keyframe = None
+
+    next_class_poll = time.monotonic() + CLASS_POLL_INTERVAL
+
     idx = 0
     while 0 <= idx < len(image_paths):
+        img_idx = idx
         img_path = Path(image_paths[idx])
         label_file = labels_dir / f"{img_path.stem}.txt"
 
-        image = pygame.image.load(str(img_path)).convert_alpha()
-        iw, ih = image.get_size()
+        render_cache, label_src = prefetcher.get(idx)
+        prefetcher.prefetch(idx)
+
+        # labels live in image pixels; scale only maps them to the screen
+        iw, ih = render_cache.size
         scale = min(IMG_WIDTH / iw, IMG_HEIGHT / ih)
         disp_size = (int(iw * scale), int(ih * scale))
-        image_disp = pygame.transform.smoothscale(image, disp_size)
         # ===== ZOOM VARIABLES =====
         zoom = 1.0
         min_zoom = 0.2
@@ -428,54 +2105,90 @@ def annotate_images_pygame(
         selected_idx = None
         current_polygon = []
 
-        boxes = []
-        if label_file.exists():
-            for line in label_file.read_text().splitlines():
-                parts = list(map(float, line.split()))
-                cid = int(parts[0])
-
-            # ===== SEGMENTATION =====
-                if len(parts) > 5:
-                    pts = parts[1:]
-                    mask = [
-                        (pts[i] * disp_size[0], pts[i+1] * disp_size[1])
-                        for i in range(0, len(pts), 2)
-                    ]
-
-                    xs = [p[0] for p in mask]
-                    ys = [p[1] for p in mask]
-                    x = min(xs)
-                    y = min(ys)
-                    w = max(xs) - x
-                    h = max(ys) - y
-
-                    boxes.append((x, y, w, h, cid, mask))
-
-                # ===== BBOX =====
-                else:
-                    _, xc, yc, bw, bh = parts
-                    boxes.append((
-                        (xc - bw/2) * disp_size[0],
-                        (yc - bh/2) * disp_size[1],
-                        bw * disp_size[0],
-                        bh * disp_size[1],
-                        cid,
-                        None
-                    ))  
-
-        # ===== UNDO STACK =====
-        undo_stack = []
-        redo_stack = []
+        store = AnnotationStore.from_yolo(label_src or "", iw, ih)
+        saved_counter = store.counter    # dirty when store.counter moves on
+
+        # suggestions only for images that have no labels yet:
+        # the previous frame's labels moved along, else the model's
+        propagating = False
+        if propagator and not len(store) and idx > 0:
+            prev_src = prefetcher.label(idx - 1)
+            if prev_src and prev_src.strip():
+                propagator.request(
+                    idx, idx - 1,
+                    AnnotationStore.from_yolo(prev_src, iw, ih).records(),
+                    {v: k for k, v in class_map.items()}
+                )
+                propagating = True
+        suggestions = None if (suggester or propagating) and not len(store) else []
+        if suggester:
+            labeled = index_stats["labeled"]
+            suggester.request([
+                i for i in range(idx, min(idx + SUGGEST_AHEAD + 1, len(image_paths)))
+                if label_names[i] not in labeled
+            ])
+
+        def save_labels(delay=AUTOSAVE_DELAY):
+            nonlocal saved_counter, label_src
+            if store.counter == saved_counter:
+                return
+            label_src = store.to_yolo(iw, ih, simplify_on_save)
+            writer.stage(label_file, label_src, delay)
+            # keep the prefetched copy in sync with what will be on disk
+            prefetcher.update_label(img_idx, label_src)
+            saved_counter = store.counter
+
+        def close_session():
+            save_labels(0)
+            writer.close()
+            prefetcher.close()
+            sync_index()
+            index_conn.close()
+            if suggester:
+                suggester.close()
+            if propagator:
+                propagator.close()
+
+        def follow_classes(before):
+            # classes.json changed in another session: new classes just show
+            # up; renumbered ids (a class deleted there, label files already
+            # remapped by it) are followed in memory
+            nonlocal history, class_filter, active_class_id, selected_idx, saved_counter
+            mapping = {cid: class_map.get(name) for name, cid in before.items()}
+            if all(new == cid for cid, new in mapping.items()):
+                return
+
+            # our text for this image that is not on disk yet has the old ids
+            if writer.discard(label_file) or store.counter != saved_counter:
+                store.map_classes(mapping)    # keep the edits, staged again in the new ids
+            else:
+                text = label_file.read_text() if label_file.exists() else ""
+                store.set_records(AnnotationStore.from_yolo(text, iw, ih).records())
+                saved_counter = store.counter
+            prefetcher.reload_labels()
+            label_index.refresh_label_index(index_conn, dataset_dir)
+
+            undo_histories.clear()
+            history = UndoHistory()
+            undo_histories[str(img_path)] = history
+            class_filter = None
+            index_stats.clear()
+            sync_index()
+            active_class_id = 0
+            selected_idx = None
+
+        # ===== UNDO HISTORY (survives leaving the image) =====
+        history = undo_histories.pop(str(img_path), None) or UndoHistory()
+        undo_histories[str(img_path)] = history
+        trim_undo_histories(undo_histories)
+        drag_origin = None       # (idx, box, rev) at drag start -> one command
+        hit_index = SpatialIndex(GRID_CELL / scale)
         selected_idx = None
 
         class_menu = None        # {"cid": int, "pos": (x,y)}
         confirm_delete = None    # {"cid": int}
 
 
-        def push_undo():
-            undo_stack.append(copy.deepcopy(boxes))
-            redo_stack.clear()
-
         current_box = None
         drawing = False
         label_text = ""
@@ -503,25 +2216,39 @@ def annotate_images_pygame(
         class_max_scroll = 0
         button_max_scroll = 0
 
+        dirty = pygame.Rect(0, 0, win_w, win_h)    # area to redraw, None = nothing
+
         running = True
         while running:
-            for event in pygame.event.get():
+            events = pygame.event.get()
+            if not (events or dirty or smooth_centering):
+                # idle: sleep until something happens
+                event = pygame.event.wait(IDLE_WAIT_MS)
+                if event.type != pygame.NOEVENT:
+                    events = [event] + pygame.event.get()
+
+            for event in events:
+                region = event_region(event, win_w, win_h)
+                dirty = dirty.union(region) if dirty else region
+
                 if event.type == pygame.QUIT:
+                    close_session()
                     return "Exited"
                 
                 if event.type == pygame.VIDEORESIZE:
                     win_w, win_h = event.w, event.h
                     screen = pygame.display.set_mode((win_w, win_h), pygame.RESIZABLE)
 
+                    # labels are in image pixels -> only the view changes
                     scale = min(
                         (win_w - SIDEBAR_WIDTH) / iw,
                         win_h / ih
                     )
                     disp_size = (int(iw * scale), int(ih * scale))
-                    image_disp = pygame.transform.smoothscale(image, disp_size)
 
                     offset_x = (win_w - SIDEBAR_WIDTH - disp_size[0]) // 2
                     offset_y = (win_h - disp_size[1]) // 2
+                    dirty = pygame.Rect(0, 0, win_w, win_h)
 
                 # ===== MOUSE WHEEL ZOOM =====
                 if event.type == pygame.MOUSEWHEEL:
@@ -589,53 +2316,42 @@ def annotate_images_pygame(
                             # กรณีมี class ใหม่
                             if label_text.strip():
                                 active_class_id = get_class_id(label_text.strip())
-                                write_data_yaml(dataset_dir, class_map)
                                 label_text = ""
 
                             # ===== กรณีแก้ไข polygon ของ box เดิม =====
+                            poly = np.array(current_polygon, dtype=float)
+
                             if selected_idx is not None:
-                                old = boxes[selected_idx]
+                                old = store.get(selected_idx)
                                 x, y, w, h, cid = old[:5]
 
-                                push_undo()
-                                boxes[selected_idx] = (
-                                    x, y, w, h,
-                                    cid,
-                                    current_polygon.copy()
-                                )
+                                store.replace(selected_idx, (x, y, w, h, cid, poly))
+                                history.push(("replace", selected_idx, old, store.get(selected_idx)))
 
                             # ===== กรณีสร้าง polygon ใหม่ =====
                             else:
-                                xs = [p[0] for p in current_polygon]
-                                ys = [p[1] for p in current_polygon]
-
-                                x = min(xs)
-                                y = min(ys)
-                                w = max(xs) - x
-                                h = max(ys) - y
+                                x, y = poly.min(axis=0)
+                                w, h = poly.max(axis=0) - (x, y)
 
-                                push_undo()
-                                boxes.append(
-                                    (x, y, w, h, active_class_id, current_polygon.copy())
-                                )
+                                store.insert(len(store), (x, y, w, h, active_class_id, poly))
+                                history.push(("add", len(store) - 1, store.get(len(store) - 1)))
 
                             current_polygon = []
                        
                    
                     elif event.key == pygame.K_u and mods & pygame.KMOD_CTRL:
-                        if undo_stack:
-                            redo_stack.append(copy.deepcopy(boxes))
-                            boxes[:] = undo_stack.pop()
+                        if history.undo(store):
+                            selected_idx = None
                    
                     elif event.key == pygame.K_y and mods & pygame.KMOD_CTRL:
-                        if redo_stack:
-                            undo_stack.append(copy.deepcopy(boxes))  # กลับไป undo ได้
-                            boxes[:] = redo_stack.pop()
+                        if history.redo(store):
+                            selected_idx = None
 
                     elif event.key == pygame.K_c and mods & pygame.KMOD_CTRL:
-                        if boxes:
-                            push_undo()
-                            boxes.clear()
+                        if len(store):
+                            history.push(("set", store.records(), []))
+                            store.set_records([])
+                            selected_idx = None
 
                     elif event.key == pygame.K_h and mods & pygame.KMOD_CTRL:
                         show_help = not show_help
@@ -644,17 +2360,83 @@ def annotate_images_pygame(
                         draw_mode = "polygon" if draw_mode == "rect" else "rect"
                         current_polygon = []
 
-                    elif event.key == pygame.K_LEFT:
-                        idx -= 1
-                        selected_idx = None
-                        current_polygon = []
-                        running = False
-
-                    elif event.key == pygame.K_RIGHT or (event.key == pygame.K_n and mods & pygame.KMOD_ALT):
-                        idx += 1
-                        selected_idx = None
-                        current_polygon = []
-                        running = False
+                    elif event.key == pygame.K_LEFT or event.key == pygame.K_RIGHT or (event.key == pygame.K_n and mods & pygame.KMOD_ALT):
+                        step = -1 if event.key == pygame.K_LEFT else 1
+                        if class_filter is None:
+                            i = idx + step
+                        else:
+                            # no other image with the class: stay here, not past the ends (= done)
+                            names = label_index.labeled_files(index_conn, split, class_filter)
+                            i = find_image(idx + step, step, names, True)
+                            if not 0 <= i < len(image_paths):
+                                i = idx
+                        if i != idx:
+                            idx = i
+                            selected_idx = None
+                            current_polygon = []
+                            running = False
+
+                    elif event.key == pygame.K_u and mods & pygame.KMOD_ALT:
+                        labeled = index_stats["labeled"]
+                        i = find_image(idx + 1, 1, labeled, False)
+                        if i == len(image_paths):
+                            i = find_image(0, 1, labeled, False)    # wrap around
+                        if i < len(image_paths) and i != idx:
+                            idx = i
+                            selected_idx = None
+                            current_polygon = []
+                            running = False
+
+                    elif event.key == pygame.K_f and mods & pygame.KMOD_ALT:
+                        class_filter = None
+
+                    elif event.key == pygame.K_a and mods & pygame.KMOD_ALT:
+                        accepted = [
+                            (x, y, w, h, class_map[name], poly)
+                            for x, y, w, h, name, poly in suggestions or []
+                            if name in class_map
+                        ]
+                        if accepted:
+                            new_boxes = store.records() + accepted
+                            history.push(("set", store.records(), new_boxes))
+                            store.set_records(new_boxes)
+                            selected_idx = None
+                        suggestions = []
+
+                    elif event.key == pygame.K_d and mods & pygame.KMOD_ALT:
+                        suggestions = []
+
+                    elif event.key == pygame.K_k and mods & pygame.KMOD_ALT:
+                        keyframe = img_idx
+
+                    elif event.key == pygame.K_i and mods & pygame.KMOD_ALT:
+                        # fill the unlabeled images between the keyframe and this one
+                        if keyframe is not None and keyframe != img_idx and len(store):
+                            save_labels(0)
+                            writer.flush()
+                            sync_index()
+
+                            a = AnnotationStore.from_yolo(prefetcher.label(keyframe) or "", iw, ih).records()
+                            b = store.records()
+                            if keyframe > img_idx:
+                                a, b = b, a
+                            lo, hi = sorted((keyframe, img_idx))
+                            pairs = match_records(a, b)
+
+                            filled = 0
+                            for i in range(lo + 1, hi):
+                                if not pairs or label_names[i] in index_stats["labeled"]:
+                                    continue
+                                between = AnnotationStore()
+                                between.set_records(interpolate_records(a, b, pairs, (i - lo) / (hi - lo)))
+                                text = between.to_yolo(iw, ih)
+                                writer.stage(labels_dir / label_names[i], text, 0)
+                                prefetcher.update_label(i, text)
+                                undo_histories.pop(str(Path(image_paths[i])), None)
+                                filled += 1
+                            writer.flush()
+                            print(f"Interpolated {filled} images between {lo + 1} and {hi + 1}")
+                        keyframe = img_idx
 
                     elif event.key == pygame.K_UP:
                         # กรณีกำลังวาดกรอบใหม่ (ยังไม่กด Enter)
@@ -663,10 +2445,10 @@ def annotate_images_pygame(
                         
                          # กรณีเลือก box ที่มีอยู่แล้ว
                         elif selected_idx is not None:
-                            push_undo()
                             active_class_id = max(0, active_class_id - 1)
-                            x, y, w, h, _, mask = boxes[selected_idx]
-                            boxes[selected_idx] = (x, y, w, h, active_class_id, mask)
+                            old = store.get(selected_idx)
+                            store.set_class(selected_idx, active_class_id)
+                            history.push(("replace", selected_idx, old, store.get(selected_idx)), merge=True)
 
                     elif event.key == pygame.K_DOWN:
                         max_cid = max(len(class_map) - 1, 0)
@@ -677,22 +2459,20 @@ def annotate_images_pygame(
 
                         # กรณีเลือก box ที่มีอยู่แล้ว
                         elif selected_idx is not None:
-                            push_undo()
                             active_class_id = min(max_cid, active_class_id + 1)
-                            x, y, w, h, _, mask = boxes[selected_idx]
-                            boxes[selected_idx] = (x, y, w, h, active_class_id, mask)
+                            old = store.get(selected_idx)
+                            store.set_class(selected_idx, active_class_id)
+                            history.push(("replace", selected_idx, old, store.get(selected_idx)), merge=True)
     
                     elif event.key == pygame.K_DELETE and selected_idx is not None:
-                        push_undo()            # ถ้ามี Undo
-                        boxes.pop(selected_idx)
+                        history.push(("delete", selected_idx, store.delete(selected_idx)))
                         selected_idx = None
 
                     elif event.key == pygame.K_RETURN and current_box:
-                        push_undo()  # เก็บก่อนแก้
                         if label_text.strip():
                             active_class_id = get_class_id(label_text.strip())
-                            write_data_yaml(dataset_dir, class_map)  
-                        boxes.append((*current_box, active_class_id, None)) 
+                        store.insert(len(store), (*current_box, active_class_id, None))
+                        history.push(("add", len(store) - 1, store.get(len(store) - 1)))
                         current_box = None
                         label_text = ""
 
@@ -736,7 +2516,9 @@ def annotate_images_pygame(
                         for r, act in exit_actions:
                             if r.collidepoint(event.pos):
                                 if act == "yes":
-                                    write_data_yaml(dataset_dir, class_map)
+                                    with registry.locked():
+                                        write_data_yaml(dataset_dir, class_map)
+                                    close_session()
                                     return "Exited"
                                 else:
                                     confirm_exit = False
@@ -744,17 +2526,15 @@ def annotate_images_pygame(
                         continue
 
                     # ===== UNDO BUTTON =====
-                    if btn_undo.collidepoint(event.pos) and undo_stack:
-                        if undo_stack:
-                            redo_stack.append(copy.deepcopy(boxes))
-                            boxes[:] = undo_stack.pop()
+                    if btn_undo.collidepoint(event.pos) and history.undo_stack:
+                        if history.undo(store):
+                            selected_idx = None
                         continue
 
                     # ===== REDO BUTTON =====
-                    if btn_redo.collidepoint(event.pos) and redo_stack:
-                        if redo_stack:
-                            undo_stack.append(copy.deepcopy(boxes))
-                            boxes[:] = redo_stack.pop()
+                    if btn_redo.collidepoint(event.pos) and history.redo_stack:
+                        if history.redo(store):
+                            selected_idx = None
                         continue
 
                     if btn_exit.collidepoint(event.pos):
@@ -781,32 +2561,31 @@ def annotate_images_pygame(
                     mx, my = event.pos
 
                     # แปลงเป็นพิกัดภาพจริง
-                    mx = (mx - offset_x) / zoom
-                    my = (my - offset_y) / zoom
+                    mx = (mx - offset_x) / (zoom * scale)
+                    my = (my - offset_y) / (zoom * scale)
 
                     if draw_mode == "polygon":
 
                         clicked_existing = False
 
                         # ตรวจว่าคลิกโดน polygon จริงไหม
-                        for i, box in enumerate(boxes):
-                            x, y, w, h, cid = box[:5]
-                            mask = box[5] if len(box) == 6 else None
+                        near = hit_index.vertex_at(store, mx, my, VERTEX_PICK / scale)
+                        candidates = set(near) | set(hit_index.boxes_at(store, mx, my))
+
+                        for i in sorted(candidates):
+                            cid = int(store.cls[i])
+                            mask = store.polygon(i)
 
-                            if mask and len(mask) >= 3:
+                            if len(mask) >= 3:
 
                                 # ⭐ ตรวจคลิกโดน vertex ก่อน
-                                for vidx, (vx, vy) in enumerate(mask):
-                                    if abs(mx - vx) < 6 and abs(my - vy) < 6:
-                                        push_undo()
-                                        selected_idx = i
-                                        drag_vertex_idx = vidx
-                                        dragging_vertex = True
-                                        active_class_id = cid
-                                        clicked_existing = True
-                                        break
-
-                                if clicked_existing:
+                                if i in near:
+                                    drag_origin = (i, store.get(i), store.rev[i])
+                                    selected_idx = i
+                                    drag_vertex_idx = near[i]
+                                    dragging_vertex = True
+                                    active_class_id = cid
+                                    clicked_existing = True
                                     break
 
                                 if point_in_polygon(mx, my, mask):
@@ -837,35 +2616,38 @@ def annotate_images_pygame(
                         for r, act in confirm_actions:
                             if r.collidepoint(event.pos):
                                 if act == "yes":
-                                    push_undo()
-                                    cid = confirm_delete["cid"]
-
-                                    name = next(k for k,v in class_map.items() if v == cid)
-                                    class_map.pop(name)
-
-                                    new_map = {k:i for i,k in enumerate(class_map.keys())}
-                                    class_map.clear()
-                                    class_map.update(new_map)
-
-                                    new_boxes = []
-                                    for box in boxes:
-                                        x, y, w, h, c = box[:5]
-                                        mask = box[5] if len(box) == 6 else None
-                                        if c == cid:
-                                            continue
-                                        elif c > cid:
-                                            new_boxes.append((x, y, w, h, c-1, mask))
-                                        else:
-                                            new_boxes.append((x, y, w, h, c, mask))
-
-                                    boxes[:] = new_boxes
-                                    class_map_path.write_text(
-                                        json.dumps(class_map, indent=2, ensure_ascii=False),
-                                        encoding="utf-8"
-                                    )
-                                    write_data_yaml(dataset_dir, class_map)
-                                    active_class_id = 0
-                                    selected_idx = None
+                                    name = next((k for k,v in class_map.items() if v == confirm_delete["cid"]), None)
+
+                                    # other sessions wait; their changes so far come first
+                                    with registry.locked():
+                                        before = registry.refresh()
+                                        if before is not None:
+                                            follow_classes(before)
+
+                                        if name in class_map:
+                                            cid = class_map[name]
+                                            new_map, mapping = remap.delete_class_mapping(class_map, name)
+
+                                            # every label file of the dataset, not just this image
+                                            save_labels(0)
+                                            writer.flush()
+                                            remap.remap_label_files(dataset_dir, mapping)
+                                            prefetcher.reload_labels()
+
+                                            store.remove_class(cid)
+                                            saved_counter = store.counter   # already remapped on disk
+
+                                            # old ids in every history -> start over
+                                            undo_histories.clear()
+                                            history = UndoHistory()
+                                            undo_histories[str(img_path)] = history
+                                            class_filter = None
+                                            index_stats.clear()
+                                            sync_index()
+                                            registry.replace(new_map)
+                                            write_data_yaml(dataset_dir, class_map)
+                                            active_class_id = 0
+                                            selected_idx = None
 
                                 confirm_delete = None
                                 break
@@ -879,19 +2661,24 @@ def annotate_images_pygame(
                                 drawing = False       
                                 current_box = None
                                 break
+                            if r.collidepoint(event.pos) and act == "filter":
+                                # ←/→ only visit images with this class
+                                class_filter = None if class_menu["filtered"] else class_menu["cid"]
+                                class_menu = None
+                                break
                         continue
                     
                     selected_idx = None
                     resizing = False
                     resize_corner = None
 
-                    for i, box in enumerate(boxes):
-                        x, y, w, h, _ = box[:5] 
+                    for i in hit_index.boxes_at(store, mx, my):
+                        x, y, w, h = store.xywh[i].tolist()
                         if x <= mx <= x + w and y <= my <= y + h:
                             selected_idx = i
-                            corner = detect_corner(mx, my, x, y, w, h)
+                            corner = detect_corner(mx, my, x, y, w, h, HANDLE_SIZE / scale)
                             if corner:
-                                push_undo()
+                                drag_origin = (i, store.get(i), store.rev[i])
                                 resizing = True
                                 drawing = False
                                 resize_corner = corner
@@ -912,7 +2699,7 @@ def annotate_images_pygame(
 
                     for rect, cid in class_clicks:
                         if rect.collidepoint(mx, my):
-                            class_menu = {"cid": cid, "pos": (mx, my)}
+                            class_menu = {"cid": cid, "pos": (mx, my), "filtered": cid == class_filter}
                             break    
 
                 if event.type == pygame.MOUSEBUTTONUP and event.button == 1:
@@ -924,6 +2711,13 @@ def annotate_images_pygame(
                     if dragging_vertex:
                         dragging_vertex = False
                         drag_vertex_idx = None
+
+                    # whole drag / resize = one undo step
+                    if drag_origin:
+                        i, old, rev = drag_origin
+                        if i < len(store) and store.rev[i] != rev:
+                            history.push(("replace", i, old, store.get(i)))
+                        drag_origin = None
                     class_dragging_scroll = False
                     button_dragging_scroll = False
 
@@ -987,8 +2781,8 @@ def annotate_images_pygame(
                     if drawing:
                         x1, y1 = start_pos
 
-                        x2 = (event.pos[0] - offset_x) / zoom
-                        y2 = (event.pos[1] - offset_y) / zoom
+                        x2 = (event.pos[0] - offset_x) / (zoom * scale)
+                        y2 = (event.pos[1] - offset_y) / (zoom * scale)
 
                         current_box = (
                             min(x1, x2),
@@ -1004,46 +2798,36 @@ def annotate_images_pygame(
                     # =========================
                     if resizing and selected_idx is not None:
 
-                        mx = (event.pos[0] - offset_x) / zoom
-                        my = (event.pos[1] - offset_y) / zoom
+                        mx = (event.pos[0] - offset_x) / (zoom * scale)
+                        my = (event.pos[1] - offset_y) / (zoom * scale)
 
-                        x, y, w, h, c = boxes[selected_idx][:5]
-                        ox, oy, ow, oh, c, mask = boxes[selected_idx]
+                        x, y, w, h = store.xywh[selected_idx].tolist()
+                        min_size = 5 / scale
 
                         dx = mx - resize_start[0]
                         dy = my - resize_start[1]
 
                         if resize_corner == "br":
-                            w = max(5, w + dx)
-                            h = max(5, h + dy)
+                            w = max(min_size, w + dx)
+                            h = max(min_size, h + dy)
 
                         elif resize_corner == "tr":
                             y += dy
-                            h = max(5, h - dy)
-                            w = max(5, w + dx)
+                            h = max(min_size, h - dy)
+                            w = max(min_size, w + dx)
 
                         elif resize_corner == "bl":
                             x += dx
-                            w = max(5, w - dx)
-                            h = max(5, h + dy)
+                            w = max(min_size, w - dx)
+                            h = max(min_size, h + dy)
 
                         elif resize_corner == "tl":
                             x += dx
                             y += dy
-                            w = max(5, w - dx)
-                            h = max(5, h - dy)
-
-                        new_mask = None
-                        if mask:
-                            sx = w / ow
-                            sy = h / oh
-                            new_mask = [
-                                (x + (px - ox) * sx,
-                                y + (py - oy) * sy)
-                                for px, py in mask
-                            ]
-
-                        boxes[selected_idx] = (x, y, w, h, c, new_mask)
+                            w = max(min_size, w - dx)
+                            h = max(min_size, h - dy)
+
+                        store.set_box(selected_idx, x, y, w, h)
                         resize_start = (mx, my)
 
                         continue
@@ -1054,63 +2838,70 @@ def annotate_images_pygame(
                     # =========================
                     if dragging_vertex and selected_idx is not None:
 
-                        mx = (event.pos[0] - offset_x) / zoom
-                        my = (event.pos[1] - offset_y) / zoom
-
-                        x, y, w, h, cid = boxes[selected_idx][:5]
-                        mask = boxes[selected_idx][5]
-
-                        new_mask = mask.copy()
-                        new_mask[drag_vertex_idx] = (mx, my)
+                        mx = (event.pos[0] - offset_x) / (zoom * scale)
+                        my = (event.pos[1] - offset_y) / (zoom * scale)
 
-                        xs = [p[0] for p in new_mask]
-                        ys = [p[1] for p in new_mask]
-
-                        nx = min(xs)
-                        ny = min(ys)
-                        nw = max(xs) - nx
-                        nh = max(ys) - ny
-
-                        boxes[selected_idx] = (nx, ny, nw, nh, cid, new_mask)
+                        store.move_vertex(selected_idx, drag_vertex_idx, mx, my)
 
                         continue
 
+            # ===== AUTOSAVE (debounced, only when changed) =====
+            if not (resizing or dragging_vertex):
+                save_labels()
+
+            # background results / animation -> full redraw
+            full = pygame.Rect(0, 0, win_w, win_h)
+            if sync_index() or smooth_centering or render_cache.poll():
+                dirty = full
+            if time.monotonic() >= next_class_poll:
+                next_class_poll = time.monotonic() + CLASS_POLL_INTERVAL
+                before = registry.refresh()
+                if before is not None:
+                    follow_classes(before)
+                    dirty = full
+            if suggestions is None:
+                moved = propagator.get(img_idx) if propagating else []
+                if moved:
+                    suggestions = moved
+                elif moved is not None:
+                    suggestions = suggester.get(img_idx) if suggester else []
+                if suggestions is not None:
+                    dirty = full
+
+            if not dirty:
+                continue
+            screen.set_clip(dirty)
+
+            view = zoom * scale
             screen.fill(BG_COLOR)
-            scaled_img = pygame.transform.smoothscale(
-            image_disp,
-            (int(disp_size[0] * zoom), int(disp_size[1] * zoom))
+            render_cache.draw(
+                screen,
+                (int(iw * view), int(ih * view)),
+                (offset_x, offset_y),
+                pygame.Rect(0, 0, win_w - SIDEBAR_WIDTH, win_h)
             )
 
-            screen.blit(scaled_img, (offset_x, offset_y))
+            screen_boxes, screen_polys = store.screen_geometry(view, offset_x, offset_y)
+            canvas_w = win_w - SIDEBAR_WIDTH
 
-            for i, box in enumerate(boxes):
-                if len(box) == 5:
-                    x, y, w, h, cid = box
-                    mask = None          
-                else:
-                    x, y, w, h, cid, mask = box
+            for i, (x, y, w, h) in enumerate(screen_boxes):
+                if x > canvas_w or y > win_h or x + w < 0 or y + h < 0:
+                    continue    # off screen
+                cid = int(store.cls[i])
 
                 color = (255, 255, 0) if i == selected_idx else get_class_color(cid)
                 pygame.draw.rect(
                     screen,
                     color,
-                    (
-                        x * zoom + offset_x,
-                        y * zoom + offset_y,
-                        w * zoom,
-                        h * zoom
-                    ),
+                    (x, y, w, h),
                     BOX_THICKNESS
                 )
 
                 # =========================
                 # DRAW SAVED POLYGON
                 # =========================
-                if mask and len(mask) >= 3:
-                    scaled_mask = [
-                        (px * zoom + offset_x, py * zoom + offset_y)
-                        for px, py in mask
-                    ]
+                scaled_mask = screen_polys[i]
+                if scaled_mask:
 
                     pygame.draw.polygon(
                         screen,
@@ -1126,15 +2917,12 @@ def annotate_images_pygame(
                 # วาด resize handle (4 มุม)
                 # ===============================ห
                 if i == selected_idx:
-                    for px, py in [
+                    for sx, sy in [
                         (x, y),
                         (x + w, y),
                         (x, y + h),
                         (x + w, y + h),
                     ]:
-                        sx = px * zoom + offset_x
-                        sy = py * zoom + offset_y
-
                         pygame.draw.rect(
                             screen,
                             (255, 255, 255),
@@ -1146,6 +2934,24 @@ def annotate_images_pygame(
                             )
                         )
 
+            # ===== MODEL SUGGESTIONS (not labels until accepted) =====
+            for x, y, w, h, name, poly in suggestions or []:
+                if name not in class_map:
+                    continue
+                pygame.draw.rect(
+                    screen,
+                    SUGGEST_COLOR,
+                    (x * view + offset_x, y * view + offset_y, w * view, h * view),
+                    1
+                )
+                if poly is not None:
+                    pygame.draw.polygon(
+                        screen,
+                        SUGGEST_COLOR,
+                        (poly * view + (offset_x, offset_y)).tolist(),
+                        1
+                    )
+
             if current_box:
                 x, y, w, h = current_box
 
@@ -1153,15 +2959,23 @@ def annotate_images_pygame(
                     screen,
                     (255,255,0),
                     (
-                        x * zoom + offset_x,
-                        y * zoom + offset_y,
-                        w * zoom,
-                        h * zoom
+                        x * view + offset_x,
+                        y * view + offset_y,
+                        w * view,
+                        h * view
                     ),
                     1
                 )
 
-            info = font.render(f"{idx+1}/{len(image_paths)} | Boxes:{len(boxes)} | Typing:{label_text}", True, FONT_COLOR)
+            info_text = f"{idx+1}/{len(image_paths)} | Labeled:{index_stats['n_labeled']} | Boxes:{len(store)}"
+            if class_filter is not None:
+                name = next((k for k, v in class_map.items() if v == class_filter), class_filter)
+                info_text += f" | Filter:{name}"
+            if suggestions:
+                info_text += f" | Suggested:{len(suggestions)}"
+            if keyframe is not None:
+                info_text += f" | Key:{keyframe + 1}"
+            info = render_text(font, f"{info_text} | Typing:{label_text}", FONT_COLOR)
             screen.blit(info, (10, win_h - 28))
 
             # ===== Draw Sidebar Background =====
@@ -1181,7 +2995,9 @@ def annotate_images_pygame(
                     active_class_id,
                     class_scroll,
                     win_w,
-                    win_h
+                    win_h,
+                    index_stats["counts"],
+                    class_list_cache
                 )
             menu_actions = draw_class_menu(screen, font, class_menu)
             confirm_actions = draw_confirm_popup(screen, font, confirm_delete, win_w, win_h)
@@ -1192,7 +3008,7 @@ def annotate_images_pygame(
             # =========================
             if draw_mode == "polygon" and len(current_polygon) >= 2:
                 scaled_preview = [
-                    (px * zoom + offset_x, py * zoom + offset_y)
+                    (px * view + offset_x, py * view + offset_y)
                     for px, py in current_polygon
                 ]
 
@@ -1245,17 +3061,17 @@ def annotate_images_pygame(
                 SIDEBAR_WIDTH,
                 button_area_height
             )
-            screen.set_clip(clip_rect)
+            screen.set_clip(clip_rect.clip(dirty))
 
-            draw_button(screen, font, btn_undo, "Undo", disabled=(len(undo_stack)==0))
-            draw_button(screen, font, btn_redo, "Redo", disabled=(len(redo_stack)==0))
+            draw_button(screen, font, btn_undo, "Undo", disabled=(len(history.undo_stack)==0))
+            draw_button(screen, font, btn_redo, "Redo", disabled=(len(history.redo_stack)==0))
 
             draw_button(screen, font, btn_reset, "RESET VIEW")
             draw_button(screen, font, btn_rect, "RECT MODE", active=(draw_mode=="rect"))
             draw_button(screen, font, btn_poly, "POLYGON MODE", active=(draw_mode=="polygon"))
             draw_button(screen, font, btn_exit, "EXIT")
 
-            screen.set_clip(None)
+            screen.set_clip(dirty)
 
             button_scrollbar_rect, button_max_scroll = draw_button_scrollbar(
                 screen,
@@ -1267,36 +3083,22 @@ def annotate_images_pygame(
             
             draw_tooltip(screen, font, show_help, win_w, win_h)
             
-            pygame.display.flip()
+            screen.set_clip(None)
+            pygame.display.update(dirty)
+            dirty = None
             clock.tick(60)
 
-        with open(label_file, "w") as f:
-            for box in boxes:
-                x, y, w, h, cid = box[:5]
-                mask = box[5] if len(box) == 6 else None
-                # ===== SEGMENTATION (YOLOv8) =====
-                if mask and len(mask) >= 3:
-                    seg = []
-                    for px, py in mask:
-                        seg.append(
-                            f"{px / disp_size[0]:.6f} {py / disp_size[1]:.6f}"
-                        )
-
-                    f.write(
-                        f"{cid} " + " ".join(seg) + "\n"
-                    )
-
-                # ===== BBOX (fallback) =====
-                else:
-                    xc = (x + w / 2) / disp_size[0]
-                    yc = (y + h / 2) / disp_size[1]
-
-                    f.write(
-                        f"{cid} {xc:.6f} {yc:.6f} "
-                        f"{w/disp_size[0]:.6f} {h/disp_size[1]:.6f}\n"
-                    )
-
-
+        save_labels(0)
+        writer.expedite(label_file)
+
+    writer.close()
+    prefetcher.close()
+    sync_index()
+    index_conn.close()
+    if suggester:
+        suggester.close()
+    if propagator:
+        propagator.close()
     return "Done"
 
 main_callable = annotate_images_pygame
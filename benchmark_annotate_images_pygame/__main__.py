@@ -0,0 +1,333 @@
+from pathlib import Path
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import threading
+import numpy as np
+import pygame
+
+# sibling nodes import from the pack folder; shared helpers live in class_registry
+PACK_ROOT = str(Path(__file__).resolve().parent.parent)
+if PACK_ROOT not in sys.path:
+    sys.path.append(PACK_ROOT)
+from class_registry.__main__ import load_node
+
+# =====================
+# CONFIG
+# =====================
+N_CLASSES = 50
+SEED = 0
+
+
+# =====================
+# SYNTHETIC DATASET
+# =====================
+def make_image(path, w, h, rng):
+    # gradients + blocks: compresses like a photo, not like noise
+    x = np.linspace(0, 255, w, dtype=np.float32)
+    y = np.linspace(0, 255, h, dtype=np.float32)
+    arr = np.empty((h, w, 3), dtype=np.uint8)
+    arr[..., 0] = x[None, :]
+    arr[..., 1] = y[:, None]
+    arr[..., 2] = rng.integers(0, 256)
+    for _ in range(40):
+        bx, by = rng.integers(0, w), rng.integers(0, h)
+        arr[by:by + h // 10, bx:bx + w // 10] = rng.integers(0, 256, 3)
+    pygame.image.save(pygame.surfarray.make_surface(arr.transpose(1, 0, 2)), str(path))
+
+
+def make_labels(rng, n_boxes, n_polygons, n_vertices):
+    """
+    YOLO lines in the right part of the image (x > 0.35); the left part
+    stays free for drawing. The first line is the polygon the script drags.
+    """
+    lines = []
+    for _ in range(n_polygons):
+        cx, cy = rng.uniform(0.45, 0.85), rng.uniform(0.2, 0.8)
+        angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+        radius = rng.uniform(0.03, 0.08) * rng.uniform(0.6, 1.0, n_vertices)
+        pts = np.c_[cx + radius * np.cos(angles), cy + radius * np.sin(angles)]
+        lines.append(f"{rng.integers(N_CLASSES)} " + " ".join(f"{v:.6f}" for v in pts.ravel()))
+
+    for _ in range(n_boxes):
+        bw, bh = rng.uniform(0.02, 0.08), rng.uniform(0.02, 0.08)
+        xc, yc = rng.uniform(0.35 + bw, 0.95), rng.uniform(bh, 1 - bh)
+        lines.append(f"{rng.integers(N_CLASSES)} {xc:.6f} {yc:.6f} {bw:.6f} {bh:.6f}")
+
+    return "\n".join(lines) + "\n"
+
+
+def make_dataset(work_dir, n_images, w, h, n_boxes, n_polygons, n_vertices):
+    rng = np.random.default_rng(SEED)
+    images_dir = work_dir / "images"
+    labels_dir = work_dir / "dataset" / "labels" / "train"
+    images_dir.mkdir(parents=True, exist_ok=True)
+    if labels_dir.exists():
+        shutil.rmtree(labels_dir)
+    labels_dir.mkdir(parents=True)
+
+    paths = []
+    for i in range(n_images):
+        path = images_dir / f"bench_{w}x{h}_{i}.jpg"
+        if not path.exists():
+            make_image(path, w, h, rng)
+        (labels_dir / f"{path.stem}.txt").write_text(
+            make_labels(rng, n_boxes, n_polygons, n_vertices), encoding="utf-8"
+        )
+        paths.append(path)
+
+    project_dir = work_dir / "project"
+    project_dir.mkdir(exist_ok=True)
+    (project_dir / "classes.json").write_text(
+        json.dumps({f"class_{i}": i for i in range(N_CLASSES)}, indent=2),
+        encoding="utf-8"
+    )
+    return paths, work_dir / "dataset", project_dir
+
+# =====================
+# EVENT SCRIPT
+# =====================
+def build_script(annotator, iw, ih, first_polygon, n_images):
+    """
+    Scripted session on the first image (screen coordinates follow the
+    annotator's fit-to-window layout): vertex drag, box drawing, box
+    selection, zoom, pan, zoom back, then navigation and quit.
+    """
+    E = pygame.event.Event
+    win_w, win_h = annotator.WINDOW_SIZE
+    canvas_w = win_w - annotator.SIDEBAR_WIDTH
+    scale = min(annotator.IMG_WIDTH / iw, annotator.IMG_HEIGHT / ih)
+    ox = (canvas_w - int(iw * scale)) // 2
+    oy = (win_h - int(ih * scale)) // 2
+
+    def screen(x, y):
+        return int(ox + x * iw * scale), int(oy + y * ih * scale)
+
+    def click(pos, button=1):
+        return [
+            E(pygame.MOUSEBUTTONDOWN, button=button, pos=pos),
+            E(pygame.MOUSEBUTTONUP, button=button, pos=pos),
+        ]
+
+    def drag(start, end, button=1, steps=20):
+        buttons = tuple(int(b == button) for b in (1, 2, 3))
+        (x0, y0), (x1, y1) = start, end
+        return (
+            [E(pygame.MOUSEBUTTONDOWN, button=button, pos=start)]
+            + [
+                E(pygame.MOUSEMOTION,
+                  pos=(x0 + (x1 - x0) * k // steps, y0 + (y1 - y0) * k // steps),
+                  rel=(1, 1), buttons=buttons)
+                for k in range(1, steps + 1)
+            ]
+            + [E(pygame.MOUSEBUTTONUP, button=button, pos=end)]
+        )
+
+    def key(k):
+        return E(pygame.KEYDOWN, key=k, mod=0, unicode="")
+
+    btn_x = win_w - annotator.SIDEBAR_WIDTH + 100
+    script = []
+
+    # ----- vertex drag (polygon mode button) -----
+    script += click((btn_x, win_h - 200 + 156))
+    vx, vy = screen(*first_polygon[0])
+    script += drag((vx, vy), (vx + 40, vy + 30), steps=30)
+    script += click((btn_x, win_h - 200 + 116))         # back to rect mode
+
+    # ----- draw boxes in the free left part -----
+    for k in range(10):
+        x, y = screen(0.02 + (k % 5) * 0.06, 0.1 + (k // 5) * 0.3)
+        script += drag((x, y), (x + 30, y + 40), steps=8)
+        script.append(key(pygame.K_RETURN))
+
+    # ----- select existing boxes (hit testing) -----
+    for k in range(20):
+        script += click(screen(0.4 + (k % 10) * 0.05, 0.2 + (k // 10) * 0.4))
+
+    # ----- zoom in, pan, zoom out -----
+    center = (canvas_w // 2, win_h // 2)
+    script.append(E(pygame.MOUSEMOTION, pos=center, rel=(0, 0), buttons=(0, 0, 0)))
+    script += [E(pygame.MOUSEWHEEL, x=0, y=1)] * 10
+    script += drag(center, (center[0] - 300, center[1] - 200), button=2, steps=40)
+    script += [E(pygame.MOUSEWHEEL, x=0, y=-1)] * 10
+
+    # ----- navigate -----
+    script += [key(pygame.K_RIGHT)] * (n_images - 1)
+    script += [key(pygame.K_LEFT)]
+    return script
+
+# =====================
+# MEASUREMENT
+# =====================
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1024 ** 2
+    except ImportError:
+        return None
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    ms = np.array(values) * 1000
+    return {
+        "p50": round(float(np.percentile(ms, 50)), 2),
+        "p90": round(float(np.percentile(ms, 90)), 2),
+        "p99": round(float(np.percentile(ms, 99)), 2),
+        "max": round(float(ms.max()), 2),
+    }
+
+
+def replay(annotator, image_paths, dataset_dir, project_dir, script, events_per_second):
+    """
+    Run the annotator while a thread posts the script into the real event
+    queue. Frame time = event fetch -> display update; latency = event
+    posted -> first display update after it was fetched.
+    """
+    orig_get = pygame.event.get
+    orig_wait = pygame.event.wait
+    orig_update = pygame.display.update
+    orig_mouse = pygame.mouse.get_pos
+
+    posted = {}
+    state = {"fetch": None, "mouse": (0, 0)}
+    fetched_events = []
+    frames = []
+    latency = []
+    started = threading.Event()
+
+    def fetched(events):
+        state["fetch"] = time.perf_counter()
+        for e in events:
+            seq = getattr(e, "bench_seq", None)
+            if seq is not None:
+                fetched_events.append(posted[seq])
+            if hasattr(e, "pos"):
+                state["mouse"] = e.pos
+
+    def get(*args, **kwargs):
+        events = orig_get(*args, **kwargs)
+        fetched(events)
+        return events
+
+    def wait(*args, **kwargs):
+        event = orig_wait(*args, **kwargs)
+        fetched([event])
+        return event
+
+    def update(*args, **kwargs):
+        orig_update(*args, **kwargs)
+        now = time.perf_counter()
+        if state["fetch"] is not None:
+            frames.append(now - state["fetch"])
+        latency.extend(now - t for t in fetched_events)
+        fetched_events.clear()
+        started.set()
+
+    def feed():
+        started.wait()
+        for seq, event in enumerate(script + [pygame.event.Event(pygame.QUIT)]):
+            attrs = dict(event.dict, bench_seq=seq)
+            posted[seq] = time.perf_counter()
+            pygame.event.post(pygame.event.Event(event.type, attrs))
+            time.sleep(1 / events_per_second)
+
+    pygame.event.get = get
+    pygame.event.wait = wait
+    pygame.display.update = update
+    pygame.mouse.get_pos = lambda: state["mouse"]
+    try:
+        threading.Thread(target=feed, daemon=True).start()
+        t0 = time.perf_counter()
+        result = annotator.annotate_images_pygame(
+            [str(p) for p in image_paths], str(dataset_dir), str(project_dir)
+        )
+        wall = time.perf_counter() - t0
+    finally:
+        pygame.event.get = orig_get
+        pygame.event.wait = orig_wait
+        pygame.display.update = orig_update
+        pygame.mouse.get_pos = orig_mouse
+
+    return result, wall, frames, latency
+
+# =====================
+# MAIN NODE
+# =====================
+def benchmark_annotate_images_pygame(
+    n_images: int = 5,
+    image_width: int = 4000,
+    image_height: int = 3000,
+    boxes_per_image: int = 50,
+    polygons_per_image: int = 20,
+    polygon_vertices: int = 64,
+    events_per_second: int = 120,
+    work_dir: {
+        "widget_name": "path_preview",
+        "type": str,
+        "label": "Benchmark folder (empty = temp)",
+    } = "",
+):
+    """
+    Replay a scripted session (vertex drag, drawing, selection, zoom, pan,
+    navigation) in annotate_images_pygame on a synthetic dataset and report
+    frame time / event-to-frame latency percentiles (ms) and peak RSS (MB).
+    Headless: python benchmark_annotate_images_pygame/__main__.py
+    """
+    annotator = load_node("annotate_images_pygame")
+    random.seed(SEED)
+
+    temp = not work_dir
+    work_dir = Path(tempfile.mkdtemp(prefix="annot_bench_") if temp else work_dir)
+
+    try:
+        image_paths, dataset_dir, project_dir = make_dataset(
+            work_dir, max(1, n_images), image_width, image_height,
+            boxes_per_image, polygons_per_image, max(3, polygon_vertices)
+        )
+
+        first = (dataset_dir / "labels" / "train" / f"{image_paths[0].stem}.txt")
+        first_polygon = np.array(
+            first.read_text(encoding="utf-8").splitlines()[0].split()[1:], dtype=float
+        ).reshape(-1, 2) if polygons_per_image else np.array([[0.6, 0.5]])
+
+        script = build_script(
+            annotator, image_width, image_height, first_polygon, len(image_paths)
+        )
+        result, wall, frames, latency = replay(
+            annotator, image_paths, dataset_dir, project_dir, script, events_per_second
+        )
+    finally:
+        if temp:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "result": result,
+        "events": len(script),
+        "frames": len(frames),
+        "wall_s": round(wall, 2),
+        "frame_ms": percentiles(frames),
+        "latency_ms": percentiles(latency),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+main_callable = benchmark_annotate_images_pygame
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    print(json.dumps(benchmark_annotate_images_pygame(), indent=2))
@@ -0,0 +1,217 @@
+from pathlib import Path
+import os
+import sys
+import json
+import time
+import importlib
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:      # Windows
+    fcntl = None
+    import msvcrt
+
+# =====================
+# CONFIG
+# =====================
+REGISTRY_NAME = "classes.json"    # in project_dir
+LOCK_TIMEOUT = 30.0               # seconds waiting for another session
+LARGE_IMAGE_PIXELS = 1 << 32      # drone / panorama images are legitimately huge
+
+# =====================
+# FILE LOCK
+# =====================
+@contextmanager
+def file_lock(path, timeout=LOCK_TIMEOUT):
+    """
+    Exclusive lock on <path>.lock, shared by every process using the same
+    project folder (fcntl on POSIX, msvcrt on Windows).
+    """
+    lock_path = Path(str(path) + ".lock")
+    deadline = time.monotonic() + timeout
+
+    with open(lock_path, "a+b") as f:
+        while True:
+            try:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Class registry is locked: {lock_path}")
+                time.sleep(0.05)
+
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+# =====================
+# SHARED HELPERS
+# =====================
+def load_node(name):
+    """
+    Module of a sibling node in this pack. Imported by its real name, so
+    its functions can be sent to process pool workers (the node loader
+    gives node modules names the workers cannot import).
+    """
+    root = str(Path(__file__).resolve().parent.parent)
+    if root not in sys.path:
+        sys.path.append(root)
+    return importlib.import_module(f"{name}.__main__")
+
+
+def temp_path(path):
+    # next to path, one per process: parallel writers never share a temp file
+    path = Path(path)
+    return path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+
+def write_atomic(path, data):
+    """
+    Write text, or call data(tmp) to save, into a temp file and rename it
+    over path: readers never see half a file.
+    """
+    tmp = temp_path(path)
+    try:
+        if callable(data):
+            data(tmp)
+        else:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+pixel_limit_lock = threading.Lock()
+
+
+def open_large_image(path):
+    """
+    Image.open() accepting up to LARGE_IMAGE_PIXELS. Pillow's decompression
+    bomb limit is a module global: it is raised under a lock for this call
+    only, everything else keeps the default guard.
+    """
+    from PIL import Image
+    with pixel_limit_lock:
+        limit = Image.MAX_IMAGE_PIXELS
+        if limit is not None:
+            Image.MAX_IMAGE_PIXELS = max(limit, LARGE_IMAGE_PIXELS)
+        try:
+            return Image.open(path)
+        finally:
+            Image.MAX_IMAGE_PIXELS = limit
+
+# =====================
+# REGISTRY
+# =====================
+def read_class_map(path):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8") or "{}")
+
+
+def write_class_map(path, class_map):
+    write_atomic(path, json.dumps(class_map, indent=2, ensure_ascii=False))
+
+
+class ClassRegistry:
+    """
+    classes.json of a project folder, shared by several annotator sessions.
+    Changes are made under the file lock on the latest version of the file
+    (new classes get the next free id); refresh() picks up changes made by
+    other sessions. class_map is updated in place, so holders of the dict
+    always see the current classes.
+    """
+
+    def __init__(self, project_dir):
+        self.path = Path(project_dir) / REGISTRY_NAME
+        self.class_map = {}
+        self.stamp = None
+        self.refresh()
+
+    def file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def refresh(self):
+        """
+        Re-read the file if it changed on disk. Returns the previous class
+        map when the classes changed, else None.
+        """
+        stamp = self.file_stamp()
+        if stamp == self.stamp:
+            return None
+
+        new = read_class_map(self.path)
+        self.stamp = stamp
+        if new == self.class_map:
+            return None
+
+        before = dict(self.class_map)
+        self.class_map.clear()
+        self.class_map.update(new)
+        return before
+
+    @contextmanager
+    def locked(self):
+        with file_lock(self.path):
+            yield
+
+    def add(self, name):
+        # call with the lock held, after refresh()
+        if name not in self.class_map:
+            self.class_map[name] = max(self.class_map.values(), default=-1) + 1
+            self.save()
+        return self.class_map[name]
+
+    def replace(self, class_map):
+        # call with the lock held (e.g. a class deleted / merged)
+        new = dict(class_map)
+        self.class_map.clear()
+        self.class_map.update(new)
+        self.save()
+
+    def save(self):
+        write_class_map(self.path, self.class_map)
+        self.stamp = self.file_stamp()
+
+# =====================
+# MAIN NODE
+# =====================
+def class_registry(
+    project_dir: {
+        "widget_name": "path_preview",
+        "type": str,
+        "label": "Project folder (shared classes)",
+    } = "C:/",
+):
+    """
+    Current classes of a project folder (name -> id), read under the
+    registry lock.
+    """
+    registry = ClassRegistry(project_dir)
+    with registry.locked():
+        registry.refresh()
+        return dict(registry.class_map)
+
+
+main_callable = class_registry
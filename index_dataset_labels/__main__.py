@@ -0,0 +1,209 @@
+from pathlib import Path
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+# =====================
+# CONFIG
+# =====================
+INDEX_NAME = ".label_index.sqlite"   # in dataset_dir
+READ_WORKERS = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    split       TEXT,
+    name        TEXT,
+    mtime_ns    INTEGER,
+    size        INTEGER,
+    n_objects   INTEGER,
+    n_polygons  INTEGER,
+    PRIMARY KEY (split, name)
+);
+CREATE TABLE IF NOT EXISTS file_classes (
+    split   TEXT,
+    name    TEXT,
+    cid     INTEGER,
+    count   INTEGER,
+    PRIMARY KEY (split, name, cid)
+);
+CREATE INDEX IF NOT EXISTS file_classes_cid ON file_classes (cid);
+"""
+
+# =====================
+# INDEX
+# =====================
+def open_label_index(dataset_dir):
+    """
+    SQLite index of labels/{split}/*.txt: which classes each file
+    contains and how many objects / polygons it has.
+    """
+    conn = sqlite3.connect(str(Path(dataset_dir) / INDEX_NAME), timeout=30)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def label_stats(text):
+    counts = {}
+    n_objects = 0
+    n_polygons = 0
+
+    for line in text.splitlines():
+        tokens = line.split()
+        if not tokens:
+            continue
+        cid = int(float(tokens[0]))
+        counts[cid] = counts.get(cid, 0) + 1
+        n_objects += 1
+        if len(tokens) > 5:
+            n_polygons += 1
+
+    return counts, n_objects, n_polygons
+
+
+def read_label_file(path):
+    st = os.stat(path)
+    with open(path, encoding="utf-8") as f:
+        return st.st_mtime_ns, st.st_size, label_stats(f.read())
+
+
+def store_label_stats(conn, split, name, mtime_ns, size, stats):
+    counts, n_objects, n_polygons = stats
+
+    conn.execute(
+        "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+        (split, name, mtime_ns, size, n_objects, n_polygons)
+    )
+    conn.execute("DELETE FROM file_classes WHERE split = ? AND name = ?", (split, name))
+    conn.executemany(
+        "INSERT INTO file_classes VALUES (?, ?, ?, ?)",
+        [(split, name, cid, n) for cid, n in counts.items()]
+    )
+
+
+def update_label_file(conn, split, path):
+    """
+    Re-index one label file (after it was written). Returns the objects
+    per class id of the file before and after: {cid: n}, {cid: n}.
+    """
+    path = Path(path)
+    before = file_class_counts(conn, split, path.name)
+    if not path.exists():
+        forget_label_file(conn, split, path.name)
+        return before, {}
+    mtime_ns, size, stats = read_label_file(path)
+    store_label_stats(conn, split, path.name, mtime_ns, size, stats)
+    return before, stats[0]
+
+
+def forget_label_file(conn, split, name):
+    conn.execute("DELETE FROM files WHERE split = ? AND name = ?", (split, name))
+    conn.execute("DELETE FROM file_classes WHERE split = ? AND name = ?", (split, name))
+
+
+def refresh_label_index(conn, dataset_dir):
+    """
+    Bring the index up to date with labels/*/ - only files whose mtime or
+    size changed are re-read. Returns the number of files re-read.
+    """
+    labels_root = Path(dataset_dir) / "labels"
+    if not labels_root.is_dir():
+        return 0
+
+    changed = []
+    for split_entry in os.scandir(labels_root):
+        if not split_entry.is_dir():
+            continue
+        split = split_entry.name
+
+        known = {
+            name: (mtime_ns, size)
+            for name, mtime_ns, size in conn.execute(
+                "SELECT name, mtime_ns, size FROM files WHERE split = ?", (split,)
+            )
+        }
+
+        for entry in os.scandir(split_entry.path):
+            if not entry.name.endswith(".txt") or not entry.is_file():
+                continue
+            st = entry.stat()
+            if known.pop(entry.name, None) != (st.st_mtime_ns, st.st_size):
+                changed.append((split, entry.name, entry.path))
+
+        # label files that are gone
+        for name in known:
+            forget_label_file(conn, split, name)
+
+    with ThreadPoolExecutor(READ_WORKERS) as pool:
+        results = pool.map(read_label_file, [p for _, _, p in changed])
+        for (split, name, _), result in zip(changed, results):
+            store_label_stats(conn, split, name, *result)
+
+    conn.commit()
+    return len(changed)
+
+
+def files_with_classes(conn, cids):
+    cids = list(cids)
+    if not cids:
+        return []
+    marks = ",".join("?" * len(cids))
+    return conn.execute(
+        f"SELECT DISTINCT split, name FROM file_classes WHERE cid IN ({marks})",
+        cids
+    ).fetchall()
+
+
+def labeled_files(conn, split, cid=None):
+    # label file names of a split that have objects (of class cid)
+    if cid is None:
+        rows = conn.execute(
+            "SELECT name FROM files WHERE split = ? AND n_objects > 0", (split,)
+        )
+    else:
+        rows = conn.execute(
+            "SELECT name FROM file_classes WHERE split = ? AND cid = ?", (split, cid)
+        )
+    return {name for name, in rows}
+
+
+def file_class_counts(conn, split, name):
+    return dict(conn.execute(
+        "SELECT cid, count FROM file_classes WHERE split = ? AND name = ?", (split, name)
+    ).fetchall())
+
+
+def class_counts(conn, split=None):
+    query = "SELECT cid, SUM(count) FROM file_classes"
+    args = ()
+    if split is not None:
+        query += " WHERE split = ?"
+        args = (split,)
+    return dict(conn.execute(query + " GROUP BY cid", args).fetchall())
+
+# =====================
+# MAIN NODE
+# =====================
+def index_dataset_labels(
+    dataset_dir: {
+        "widget_name": "path_preview",
+        "type": str,
+        "label": "Dataset folder",
+    } = "C:/",
+):
+    """
+    Build / refresh the label index of a dataset and return the number
+    of objects per class id (all splits).
+    """
+    dataset_dir = Path(dataset_dir)
+    if not (dataset_dir / "labels").is_dir():
+        return "labels folder not found"
+
+    conn = open_label_index(dataset_dir)
+    try:
+        refresh_label_index(conn, dataset_dir)
+        return class_counts(conn)
+    finally:
+        conn.close()
+
+
+main_callable = index_dataset_labels
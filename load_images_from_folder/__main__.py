@@ -1,13 +1,239 @@
 from pathlib import Path
+import os
+import sys
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 
+try:
+    from PIL import Image     # optional: image headers (size, format, EXIF orientation)
+except ImportError:
+    Image = None
+
+# sibling nodes import from the pack folder; shared helpers live in class_registry
+PACK_ROOT = str(Path(__file__).resolve().parent.parent)
+if PACK_ROOT not in sys.path:
+    sys.path.append(PACK_ROOT)
+from class_registry.__main__ import open_large_image
+
+# =====================
+# CONFIG
+# =====================
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.bmp'}   # compared lower-case
+SCAN_WORKERS = 16        # directories listed in parallel (network shares are latency bound)
+
+# ===== METADATA =====
+HEADER_CACHE = Path.home() / ".cache" / "image_headers.sqlite"
+HEADER_WORKERS = 16      # headers read in parallel
+EXIF_HEADER_FORMATS = {"JPEG", "MPO", "WEBP", "TIFF"}   # getexif() without decoding (PNG would decode)
+
+# =====================
+# SCANNER
+# =====================
+def scan_dir(path):
+    """Sorted image files and subdirectories of one directory (one scandir pass)."""
+    files, dirs = [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):    # no symlink loops
+                    dirs.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS and entry.is_file():
+                    files.append(entry.path)
+    except OSError as e:
+        print(f"Cannot scan {path}: {e}")
+
+    files.sort()
+    dirs.sort()
+    return files, dirs
+
+
+def iter_image_batches(folder, recursive=False, batch_size=1000, workers=SCAN_WORKERS):
+    """
+    Image paths under folder in lists of up to batch_size, as soon as they
+    are found. Order is deterministic (sorted, depth first) while the
+    subdirectories are listed ahead in a thread pool.
+    """
+    pool = ThreadPoolExecutor(workers)
+    try:
+        stack = [pool.submit(scan_dir, folder)]
+        batch = []
+        while stack:
+            files, dirs = stack.pop().result()
+            if recursive:
+                stack += [pool.submit(scan_dir, d) for d in reversed(dirs)]
+
+            for f in files:
+                batch.append(Path(f))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+    finally:
+        # also when the consumer stops early
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# =====================
+# METADATA RECORDS
+# =====================
+class ImageRecord(os.PathLike):
+    """
+    An image path plus what its header says; usable wherever a path is
+    (str(), Path(), open()). width / height / orientation are None when the
+    header cannot be read (broken or unsupported file, or no PIL).
+    """
+
+    __slots__ = ("path", "width", "height", "format", "orientation", "size", "mtime")
+
+    def __init__(self, path, width, height, format, orientation, size, mtime):
+        self.path = Path(path)
+        self.width = width
+        self.height = height
+        self.format = format
+        self.orientation = orientation    # EXIF 1..8
+        self.size = size                  # bytes
+        self.mtime = mtime                # seconds
+
+    def __fspath__(self):
+        return str(self.path)
+
+    def __str__(self):
+        return str(self.path)
+
+    def __repr__(self):
+        return f"ImageRecord('{self.path}', {self.width}x{self.height}, {self.format})"
+
+    def __reduce__(self):
+        return ImageRecord, (self.path, self.width, self.height, self.format,
+                             self.orientation, self.size, self.mtime)
+
+    @property
+    def name(self):
+        return self.path.name
+
+    @property
+    def stem(self):
+        return self.path.stem
+
+    @property
+    def ok(self):
+        return self.width is not None
+
+    @property
+    def display_size(self):
+        # size as shown: EXIF orientations 5..8 are rotated by 90 degrees
+        if self.orientation in (5, 6, 7, 8):
+            return self.height, self.width
+        return self.width, self.height
+
+
+def read_header(path):
+    # (width, height, format, orientation); PIL reads the header, no pixels
+    fmt = os.path.splitext(path)[1].lstrip('.').upper()
+    if Image is None:
+        return None, None, fmt, None
+    try:
+        with open_large_image(path) as im:
+            if im.format in EXIF_HEADER_FORMATS:
+                exif = im.getexif()
+            elif "exif" in im.info:
+                # PNG eXIf chunk before the pixels; one after them stays unread
+                exif = Image.Exif()
+                exif.load(im.info["exif"])
+            else:
+                exif = {}
+            return im.size[0], im.size[1], im.format, exif.get(0x0112)
+    except Exception:
+        return None, None, fmt, None
+
+
+def header_row(path, cached):
+    # (mtime_ns, size, width, height, format, orientation), header re-read only if the file changed
+    st = os.stat(path)
+    if cached and tuple(cached[:2]) == (st.st_mtime_ns, st.st_size):
+        return cached
+    return (st.st_mtime_ns, st.st_size, *read_header(path))
+
+
+def open_header_cache():
+    HEADER_CACHE.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(HEADER_CACHE), timeout=30, check_same_thread=False)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS headers ("
+        "path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, "
+        "width INTEGER, height INTEGER, format TEXT, orientation INTEGER)"
+    )
+    return conn
+
+
+def read_records(paths, conn):
+    """ImageRecords of paths (vanished files left out), headers cached by mtime."""
+    keys = [str(p) for p in paths]
+    cached = {}
+    for i in range(0, len(keys), 500):
+        part = keys[i:i + 500]
+        rows = conn.execute(
+            f"SELECT * FROM headers WHERE path IN ({','.join('?' * len(part))})", part
+        )
+        cached.update((row[0], row[1:]) for row in rows)
+
+    def read(key):
+        try:
+            return header_row(key, cached.get(key))
+        except OSError as e:
+            print(f"Cannot read {key}: {e}")
+            return None
+
+    with ThreadPoolExecutor(HEADER_WORKERS) as pool:
+        rows = list(pool.map(read, keys))
+
+    changed = [(k, *row) for k, row in zip(keys, rows) if row and row != cached.get(k)]
+    if changed:
+        conn.executemany("INSERT OR REPLACE INTO headers VALUES (?, ?, ?, ?, ?, ?, ?)", changed)
+        conn.commit()
+
+    return [
+        ImageRecord(p, width, height, fmt, orientation, size, mtime_ns / 1e9)
+        for p, row in zip(paths, rows) if row
+        for mtime_ns, size, width, height, fmt, orientation in [row]
+    ]
+
+
+def iter_record_batches(batches):
+    conn = open_header_cache()
+    try:
+        for batch in batches:
+            yield read_records(batch, conn)
+    finally:
+        conn.close()
+
+# =====================
+# MAIN NODE
+# =====================
 def load_images_from_folder(
     folder_path: {
         'widget_name': 'path_preview',
         'type': str,
     } = '.',
+    recursive: bool = False,
+    lazy_batches: bool = False,
+    batch_size: int = 1000,
+    with_metadata: bool = False,
 ):
-    folder = Path(folder_path)
-    images = list(folder.glob('*.png')) + list(folder.glob('*.jpg')) + list(folder.glob('*.jpeg'))
-    return images
+    """
+    Image files (.png .jpg .jpeg .webp .bmp, any case) of a folder, and of
+    its subfolders with recursive. With lazy_batches the output is a
+    generator of path lists, so the next node can start before the scan
+    is done (prepare_images_for_yolo, split_yolo_dataset); the annotator
+    and the viewers take the batches too, but wait for the whole scan.
+    Otherwise one list. with_metadata gives ImageRecords (path +
+    header size / format / orientation, byte size, mtime) instead of Paths.
+    """
+    batches = iter_image_batches(Path(folder_path), recursive, max(1, batch_size))
+    if with_metadata:
+        batches = iter_record_batches(batches)
+    if lazy_batches:
+        return batches
+    return [p for batch in batches for p in batch]
 
 main_callable = load_images_from_folder
@@ -0,0 +1,270 @@
+from pathlib import Path
+import os
+import sys
+import json
+import shutil
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import yaml
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# sibling nodes import from the pack folder; shared helpers live in class_registry
+PACK_ROOT = str(Path(__file__).resolve().parent.parent)
+if PACK_ROOT not in sys.path:
+    sys.path.append(PACK_ROOT)
+from class_registry.__main__ import load_node, write_atomic, open_large_image
+
+# =====================
+# CONFIG
+# =====================
+SPLITS = ("train", "val", "test")
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.bmp'}   # compared lower-case
+PACK_FORMATS = ("bmp", "png", "jpg")   # bmp: uncompressed, nothing to decode
+PAD_COLOR = (114, 114, 114)            # YOLO letterbox gray
+PACK_WORKERS = None      # None -> os.cpu_count()
+STAT_WORKERS = 16
+INDEX_NAME = "index.json"              # in the packed folder
+
+
+# =====================
+# LETTERBOX
+# =====================
+def letterbox_geometry(w, h, imgsz):
+    # (scaled width, scaled height, pad x, pad y): long side to imgsz, centered
+    scale = imgsz / max(w, h)
+    nw, nh = max(1, round(w * scale)), max(1, round(h * scale))
+    return nw, nh, (imgsz - nw) // 2, (imgsz - nh) // 2
+
+
+def letterbox_label(text, w, h, geometry, imgsz):
+    """
+    YOLO label text (boxes: cls cx cy bw bh, polygons: cls x y x y ...)
+    moved from the w x h image onto its letterboxed imgsz square.
+    """
+    nw, nh, px, py = geometry
+    sx, sy = nw / imgsz, nh / imgsz
+    ox, oy = px / imgsz, py / imgsz
+
+    lines = []
+    for line in text.splitlines():
+        tokens = line.split()
+        if not tokens:
+            continue
+        values = [float(v) for v in tokens[1:]]
+        if len(values) == 4:
+            cx, cy, bw, bh = values
+            values = [cx * sx + ox, cy * sy + oy, bw * sx, bh * sy]
+        else:
+            values = [v * sx + ox if i % 2 == 0 else v * sy + oy for i, v in enumerate(values)]
+        lines.append(tokens[0] + "".join(f" {v:.6f}" for v in values) + "\n")
+    return "".join(lines)
+
+
+def pack_item(src_image, src_label, dst_image, dst_label, imgsz):
+    """
+    Letterbox one image to imgsz (pool worker) and write it with its moved
+    label. JPEGs are decoded at reduced resolution (draft); EXIF rotation
+    is applied as the trainer does. Returns True, or False if unreadable.
+    """
+    try:
+        with open_large_image(src_image) as im:
+            w, h = im.size
+            if im.getexif().get(0x0112) in (5, 6, 7, 8):
+                w, h = h, w
+            nw, nh, px, py = geometry = letterbox_geometry(w, h, imgsz)
+            im.draft("RGB", (nw, nh) if (w, h) == im.size else (nh, nw))
+            im = ImageOps.exif_transpose(im).convert("RGB")
+            im = im.resize((nw, nh), Image.BILINEAR)
+    except Exception as e:
+        print(f"Cannot pack {src_image}: {e}")
+        return False
+
+    canvas = Image.new("RGB", (imgsz, imgsz), PAD_COLOR)
+    canvas.paste(im, (px, py))
+
+    text = ""
+    if os.path.exists(src_label):
+        with open(src_label, encoding="utf-8") as f:
+            text = letterbox_label(f.read(), w, h, geometry, imgsz)
+
+    # a half written file is never taken as packed
+    fmt = "JPEG" if dst_image.endswith(".jpg") else Path(dst_image).suffix[1:].upper()
+    for path in (dst_image, dst_label):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_atomic(dst_image, lambda tmp: canvas.save(tmp, format=fmt, quality=95))
+    write_atomic(dst_label, text)
+    return True
+
+# =====================
+# INDEX
+# =====================
+def stamp(path):
+    # (mtime_ns, size), None if missing
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def load_index(path, imgsz, image_format):
+    # "<split>/<name>" -> {shard, image, label}; None if missing or packed with other settings
+    try:
+        index = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if (index.get("imgsz"), index.get("format")) != (imgsz, image_format):
+        return None
+    return index["items"]
+
+
+def save_index(path, imgsz, image_format, items):
+    data = json.dumps({"imgsz": imgsz, "format": image_format, "items": items})
+    write_atomic(path, data)
+
+
+def dataset_images(dataset_dir):
+    # [(split, name)] of images/<split>, one image per stem (as the labels are)
+    found = []
+    for split in SPLITS:
+        split_dir = dataset_dir / "images" / split
+        if not split_dir.is_dir():
+            continue
+        stems = set()
+        for name in sorted(os.listdir(split_dir)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() in IMAGE_EXTENSIONS and stem not in stems:
+                stems.add(stem)
+                found.append((split, name))
+    return found
+
+
+def write_packed_yaml(dataset_dir, packed_dir):
+    # data.yaml of the dataset, pointing at the packed images
+    data = yaml.safe_load((dataset_dir / "data.yaml").read_text(encoding="utf-8")) or {}
+    data["path"] = packed_dir.as_posix()
+    for split in SPLITS:
+        if (packed_dir / "images" / split).is_dir():
+            data[split] = f"images/{split}"
+        else:
+            data.pop(split, None)
+    text = yaml.dump(data, sort_keys=False, allow_unicode=True)
+    write_atomic(packed_dir / "data.yaml", text)
+
+# =====================
+# MAIN NODE
+# =====================
+def pack_yolo_dataset(
+    dataset_dir: {
+        "widget_name": "path_preview",
+        "type": str,
+        "label": "Dataset folder",
+    } = "C:/",
+
+    imgsz: int = 640,
+    shard_size: int = 1000,
+    image_format: str = "bmp",
+):
+    """
+    Training input cache: every image of dataset/images/<split> is
+    letterboxed once to imgsz x imgsz (uncompressed BMP by default) into
+    dataset/packed_<imgsz>/images/<split>/<shard>/, its label moved onto the
+    letterbox, with data.yaml for train_yolo_model / val_yolo_model
+    (packed=True). Reruns only pack new or changed images (index.json).
+    """
+    if Image is None:
+        return "Pillow is required to pack images"
+    if image_format not in PACK_FORMATS:
+        return f"Unknown image format: {image_format} (use {', '.join(PACK_FORMATS)})"
+
+    dataset_dir = Path(dataset_dir)
+    if not (dataset_dir / "data.yaml").exists():
+        return "data.yaml not found"
+
+    packed_dir = dataset_dir / f"packed_{imgsz}"
+    index_path = packed_dir / INDEX_NAME
+    items = load_index(index_path, imgsz, image_format)
+    if items is None:
+        # files packed with other settings (e.g. bmp -> png) would be trained on twice
+        for folder in ("images", "labels"):
+            shutil.rmtree(packed_dir / folder, ignore_errors=True)
+        items = {}
+    images = dataset_images(dataset_dir)
+
+    def sources(split, name):
+        stem = os.path.splitext(name)[0]
+        return (str(dataset_dir / "images" / split / name),
+                str(dataset_dir / "labels" / split / f"{stem}.txt"))
+
+    with ThreadPoolExecutor(STAT_WORKERS) as pool:
+        stamps = list(pool.map(lambda item: [stamp(p) for p in sources(*item)], images))
+
+    # shards: folders of up to shard_size images, filled in order, never reshuffled
+    shard_counts = {}
+    for key, item in items.items():
+        shard = (key.split("/")[0], item["shard"])
+        shard_counts[shard] = shard_counts.get(shard, 0) + 1
+
+    def next_shard(split):
+        k = max([s for sp, s in shard_counts if sp == split], default=0)
+        if shard_counts.get((split, k), 0) >= shard_size:
+            k += 1
+        shard_counts[(split, k)] = shard_counts.get((split, k), 0) + 1
+        return k
+
+    def targets(split, name, shard):
+        stem = os.path.splitext(name)[0]
+        folder = f"{split}/{shard:04d}"
+        return (str(packed_dir / "images" / folder / f"{stem}.{image_format}"),
+                str(packed_dir / "labels" / folder / f"{stem}.txt"))
+
+    jobs = []
+    for (split, name), (image_stamp, label_stamp) in zip(images, stamps):
+        key = f"{split}/{name}"
+        item = items.get(key)
+        if item and [item["image"], item["label"]] == [image_stamp, label_stamp]:
+            continue
+        shard = item["shard"] if item else next_shard(split)
+        items[key] = {"shard": shard, "image": image_stamp, "label": label_stamp}
+        jobs.append((key, sources(split, name), targets(split, name, shard)))
+
+    # stale: images that left the dataset (or moved to another split)
+    present = {f"{split}/{name}" for split, name in images}
+    stale = [key for key in items if key not in present]
+    for key in stale:
+        split, name = key.split("/", 1)
+        for path in targets(split, name, items.pop(key)["shard"]):
+            if os.path.exists(path):
+                os.remove(path)
+
+    failed = 0
+    if jobs:
+        worker = load_node("pack_yolo_dataset").pack_item
+        args = [[src[0] for _, src, _ in jobs], [src[1] for _, src, _ in jobs],
+                [dst[0] for _, _, dst in jobs], [dst[1] for _, _, dst in jobs], [imgsz] * len(jobs)]
+        with ProcessPoolExecutor(PACK_WORKERS) as pool:
+            for (key, _, dst), ok in zip(jobs, pool.map(worker, *args, chunksize=8)):
+                if not ok:
+                    failed += 1
+                    del items[key]     # tried again next run
+                    for path in dst:
+                        if os.path.exists(path):
+                            os.remove(path)
+
+    if jobs or stale or not index_path.exists():
+        packed_dir.mkdir(parents=True, exist_ok=True)
+        save_index(index_path, imgsz, image_format, items)
+    write_packed_yaml(dataset_dir, packed_dir)
+
+    return (
+        f"Packed {len(jobs) - failed} images at {imgsz}px into {packed_dir.name}, "
+        f"{len(items) - len(jobs) + failed} unchanged, {len(stale)} stale removed"
+        + (f", {failed} failed" if failed else "")
+    )
+
+
+main_callable = pack_yolo_dataset
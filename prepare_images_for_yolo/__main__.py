@@ -1,6 +1,152 @@
 from pathlib import Path
+import os
+import sys
+import json
 import shutil
+import hashlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
+try:
+    import fcntl
+except ImportError:      # Windows
+    fcntl = None
+
+# sibling nodes import from the pack folder; shared helpers live in class_registry
+PACK_ROOT = str(Path(__file__).resolve().parent.parent)
+if PACK_ROOT not in sys.path:
+    sys.path.append(PACK_ROOT)
+from class_registry.__main__ import write_atomic
+
+# =====================
+# CONFIG
+# =====================
+LINK_MODES = ("copy", "hardlink", "symlink", "reflink")
+TRANSFER_WORKERS = 8     # files placed in parallel
+FICLONE = 0x40049409     # Linux ioctl: copy-on-write clone (btrfs, xfs, ...)
+
+# ===== MANIFEST =====
+STAT_WORKERS = 16        # source files stat'ed in parallel (network shares)
+MANIFEST_SAVE_EVERY = 1000   # placements between manifest checkpoints (resume)
+
+# =====================
+# PLACEMENT
+# =====================
+def reflink(src, dst):
+    # copy-on-write clone: no data copied, until one side is modified
+    if sys.platform == "darwin":
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            raise OSError(ctypes.get_errno(), "clonefile failed")
+    elif fcntl is not None and sys.platform.startswith("linux"):
+        with open(src, "rb") as s:
+            d = open(dst, "xb")    # FileExistsError: not ours, left alone
+            try:
+                with d:
+                    fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+            except OSError:
+                os.remove(dst)     # the empty file this call created
+                raise
+    else:
+        raise OSError("reflink not supported on this platform")
+    shutil.copystat(src, dst)
+
+
+def place_image(src, dst, mode):
+    """
+    Put src at dst with mode, falling back to a copy when the link cannot
+    be made (other volume, no symlink privilege, no clone support).
+    Returns (how it was placed, file size).
+    """
+    if os.path.lexists(dst):
+        return "skipped", 0
+
+    size = os.path.getsize(src)
+    try:
+        if mode == "hardlink":
+            os.link(src, dst)
+            return "hardlink", size
+        if mode == "symlink":
+            os.symlink(os.path.abspath(src), dst)
+            return "symlink", size
+        if mode == "reflink":
+            reflink(src, dst)
+            return "reflink", size
+    except FileExistsError:
+        return "skipped", 0
+    except OSError:
+        pass
+
+    shutil.copy2(src, dst)
+    return "copy", size
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def sync_image(src, dst, mode, replace=False, sha1=None, content_hash=False):
+    """
+    place_image for the manifest: replace drops the old dst first, unless
+    the content is still sha1. Returns (how, file size, sha1 | None).
+    """
+    try:
+        digest = file_hash(src) if content_hash or sha1 else None
+        if replace:
+            if sha1 and digest == sha1:
+                return "unchanged", 0, digest
+            if os.path.lexists(dst):
+                os.remove(dst)
+        how, size = place_image(src, dst, mode)
+        return how, size, digest
+    except OSError as e:
+        print(f"Cannot place {src}: {e}")
+        return "failed", 0, None
+
+
+def stat_source(path):
+    # (size, mtime_ns) or None if the source is gone
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        print(f"Cannot read {path}: {e}")
+        return None
+    return st.st_size, st.st_mtime_ns
+
+# =====================
+# MANIFEST
+# =====================
+def load_manifest(path):
+    # file name in images/<split> -> {src, size, mtime_ns, mode, placed, sha1}
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))["entries"]
+    except (ValueError, KeyError) as e:
+        print(f"Broken manifest {path}, rebuilding: {e}")
+        return {}
+
+
+def save_manifest(path, entries):
+    write_atomic(path, json.dumps({"version": 1, "entries": entries}))
+
+
+def iter_images(image_paths):
+    # a list of paths, or batches of paths (load_images_from_folder lazy_batches)
+    for item in image_paths:
+        if isinstance(item, (list, tuple)):
+            yield from item
+        else:
+            yield item
+
+# =====================
+# MAIN NODE
+# =====================
 def prepare_images_for_yolo(
     image_paths: list = [],
 
@@ -11,28 +157,135 @@ def prepare_images_for_yolo(
     } = "C:/",
 
     split: str = "train",
+    link_mode: str = "copy",
+    content_hash: bool = False,
+    prune_stale: bool = False,
+    replace_collisions: bool = False,
 ):
     """
-    Copy images into YOLO structure:
+    Place images into YOLO structure:
     dataset/images/train or dataset/images/val
+
+    link_mode: copy | hardlink | symlink | reflink (links fall back to copy)
+
+    Incremental: dataset/manifest_<split>.json records each placed image
+    (source, size, mtime, mode), so a rerun only places new images and
+    refreshes changed ones. content_hash also records sha1, so a touched
+    but identical source is not placed again. Images of the manifest that
+    are no longer in image_paths are stale, removed with prune_stale.
+    A name already placed from another source is a collision and keeps
+    that image, unless its source is gone or replace_collisions is set.
     """
 
     if not image_paths:
         return "No images"
+    if link_mode not in LINK_MODES:
+        return f"Unknown link mode: {link_mode} (use {', '.join(LINK_MODES)})"
 
     dataset_dir = Path(dataset_dir)
     images_dir = dataset_dir / f"images/{split}"
     images_dir.mkdir(parents=True, exist_ok=True)
 
-    copied = 0
-    for img in image_paths:
-        img = Path(img)
-        dst = images_dir / img.name
-        if not dst.exists():
-            shutil.copy2(img, dst)
-            copied += 1
+    manifest_path = dataset_dir / f"manifest_{split}.json"
+    manifest = load_manifest(manifest_path)
+    present = set(os.listdir(images_dir))
+
+    # one source per file name: the first one wins, the others are collisions
+    sources = {}
+    collisions = []
+    for img in iter_images(image_paths):
+        src = os.path.abspath(img)
+        name = os.path.basename(src)
+        if name not in sources:
+            sources[name] = src
+        elif sources[name] != src:
+            collisions.append((src, sources[name]))
+
+    names = list(sources)
+    with ThreadPoolExecutor(STAT_WORKERS) as pool:
+        stats = list(pool.map(stat_source, [sources[n] for n in names]))
+
+    count = Counter()
+    dirty = not manifest_path.exists()
+    jobs = []    # (name, stat, replace, old sha1)
+    for name, st in zip(names, stats):
+        if st is None:
+            count["missing"] += 1
+            continue
+        entry = manifest.get(name)
+        src = sources[name]
+        if (entry and entry["src"] != src and name in present
+                and not replace_collisions and os.path.exists(entry["src"])):
+            # the name belongs to another source, placed by an earlier run
+            collisions.append((src, entry["src"]))
+            continue
+        if entry and entry["src"] == src and entry["mode"] == link_mode and name in present:
+            if (entry["size"], entry["mtime_ns"]) == tuple(st):
+                count["unchanged"] += 1
+                continue
+            jobs.append((name, st, True, entry.get("sha1") if entry["size"] == st[0] else None))
+        elif entry is None and name in present and stat_source(images_dir / name) == st:
+            # placed before the manifest existed (or the run was cut short)
+            manifest[name] = {"src": src, "size": st[0], "mtime_ns": st[1],
+                              "mode": link_mode, "placed": "adopted"}
+            count["unchanged"] += 1
+            dirty = True
+        else:
+            jobs.append((name, st, name in present, None))
+
+    for src, kept in collisions[:10]:
+        print(f"Name collision: {src} (kept {kept})")
+
+    def run(job):
+        name, st, replace, sha1 = job
+        return sync_image(sources[name], images_dir / name, link_mode, replace, sha1, content_hash)
+
+    how = Counter()
+    copied_bytes = linked_bytes = 0
+    with ThreadPoolExecutor(TRANSFER_WORKERS) as pool:
+        for n, ((name, st, replace, _), (placed, size, digest)) in enumerate(zip(jobs, pool.map(run, jobs)), 1):
+            if placed not in ("failed", "skipped"):
+                dirty = True
+                manifest[name] = {"src": sources[name], "size": st[0], "mtime_ns": st[1],
+                                  "mode": link_mode, "placed": placed, "sha1": digest}
+            if n % MANIFEST_SAVE_EVERY == 0:
+                save_manifest(manifest_path, manifest)
+            if placed in ("unchanged", "failed", "skipped"):
+                count[placed] += 1
+                continue
+            count["refreshed" if replace else "placed"] += 1
+            how[placed] += 1
+            if placed == "copy":
+                copied_bytes += size
+            else:
+                linked_bytes += size
+
+    stale = [name for name in manifest if name not in sources]
+    if prune_stale:
+        for name in stale:
+            dst = images_dir / name
+            if os.path.lexists(dst) and manifest[name]["src"] != str(dst):   # never the source itself
+                os.remove(dst)
+            del manifest[name]
+            dirty = True
+
+    if dirty:
+        save_manifest(manifest_path, manifest)
+
+    parts = [f"{count[key]} {key}" for key in ("placed", "refreshed", "unchanged")]
+    for key in ("missing", "failed", "skipped"):
+        if count[key]:
+            parts.append(f"{count[key]} {key}")
+    if collisions:
+        parts.append(f"{len(collisions)} name collisions")
+    if stale:
+        parts.append(f"{len(stale)} stale" + (" removed" if prune_stale else ""))
+    modes = "".join(f"{h} {n}, " for h, n in how.items())
 
-    return f"Copied {copied} images to images/{split}"
+    return (
+        f"Synced images/{split}: " + ", ".join(parts) + "; " + modes +
+        f"{copied_bytes / 1e9:.2f} GB copied, {linked_bytes / 1e9:.2f} GB linked"
+    )
 
 
 main_callable = prepare_images_for_yolo
@@ -0,0 +1,166 @@
+from pathlib import Path
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# sibling nodes import from the pack folder; shared helpers live in class_registry
+PACK_ROOT = str(Path(__file__).resolve().parent.parent)
+if PACK_ROOT not in sys.path:
+    sys.path.append(PACK_ROOT)
+from class_registry.__main__ import load_node, temp_path
+
+# =====================
+# CONFIG
+# =====================
+REMAP_CHUNK = 256        # label files per worker task
+REMAP_WORKERS = None     # None -> os.cpu_count()
+
+
+# =====================
+# CLASS MAP
+# =====================
+def delete_class_mapping(class_map, name, merge_into=None):
+    """
+    Class map without `name` (ids renumbered, order kept) and the
+    old id -> new id mapping for the label files. Boxes of the deleted
+    class map to None (dropped) or to `merge_into`.
+    """
+    names = sorted(class_map, key=class_map.get)
+    new_map = {k: i for i, k in enumerate(k for k in names if k != name)}
+
+    mapping = {class_map[k]: new_map[k] for k in new_map}
+    mapping[class_map[name]] = new_map[merge_into] if merge_into else None
+    return new_map, mapping
+
+# =====================
+# REWRITE
+# =====================
+def rewrite_label_file(path, mapping):
+    """
+    Stream one label file through mapping, line by line, into a temp
+    file that replaces the original. Returns True if anything changed.
+    """
+    tmp = str(temp_path(path))
+    changed = False
+
+    with open(path, encoding="utf-8") as src, open(tmp, "w", encoding="utf-8") as dst:
+        for line in src:
+            tokens = line.split(maxsplit=1)
+            if not tokens:
+                dst.write(line)
+                continue
+
+            cid = int(float(tokens[0]))
+            new = mapping.get(cid, cid)
+            if new == cid:
+                dst.write(line)
+                continue
+
+            changed = True
+            if new is None:
+                continue
+            rest = tokens[1] if len(tokens) > 1 else "\n"
+            dst.write(f"{new} {rest}")
+
+        if changed:
+            dst.flush()
+            os.fsync(dst.fileno())
+
+    if not changed:
+        os.remove(tmp)
+        return False
+
+    os.replace(tmp, path)
+    return True
+
+
+def rewrite_label_files(paths, mapping):
+    return [p for p in paths if rewrite_label_file(p, mapping)]
+
+
+def remap_label_files(dataset_dir, mapping, workers=REMAP_WORKERS):
+    """
+    Apply an old id -> new id mapping (None = drop the object) to the
+    label files of every split. Only files that contain a remapped class
+    (per the label index) are touched. Returns the number of files rewritten.
+    """
+    index = load_node("index_dataset_labels")
+    dataset_dir = Path(dataset_dir)
+    labels_root = dataset_dir / "labels"
+
+    conn = index.open_label_index(dataset_dir)
+    try:
+        index.refresh_label_index(conn, dataset_dir)
+
+        moved = [cid for cid, new in mapping.items() if new != cid]
+        paths = [
+            str(labels_root / split / name)
+            for split, name in index.files_with_classes(conn, moved)
+        ]
+        chunks = [paths[i:i + REMAP_CHUNK] for i in range(0, len(paths), REMAP_CHUNK)]
+
+        changed = []
+        if len(chunks) > 1:
+            worker = load_node("remap_dataset_classes").rewrite_label_files
+            with ProcessPoolExecutor(workers) as pool:
+                for part in pool.map(worker, chunks, [mapping] * len(chunks)):
+                    changed += part
+        elif chunks:
+            changed = rewrite_label_files(chunks[0], mapping)
+
+        for p in changed:
+            p = Path(p)
+            index.update_label_file(conn, p.parent.name, p)
+        conn.commit()
+    finally:
+        conn.close()
+
+    return len(changed)
+
+# =====================
+# MAIN NODE
+# =====================
+def remap_dataset_classes(
+    dataset_dir: {
+        "widget_name": "path_preview",
+        "type": str,
+        "label": "Dataset folder",
+    } = "C:/",
+    project_dir: {
+        "widget_name": "path_preview",
+        "type": str,
+        "label": "Project folder (shared classes)",
+    } = "C:/",
+    delete_class: str = "",
+    merge_into: str = "",
+):
+    """
+    Delete a class from classes.json / data.yaml and every label file of
+    the dataset (all splits). With merge_into, its objects are relabelled
+    to that class instead of being removed.
+    """
+    dataset_dir = Path(dataset_dir)
+    registry = load_node("class_registry").ClassRegistry(project_dir)
+    if not registry.path.exists():
+        return "classes.json not found"
+
+    # running annotator sessions wait for the lock, then follow the new ids
+    with registry.locked():
+        registry.refresh()
+        class_map = registry.class_map
+        if delete_class not in class_map:
+            return f"Unknown class: {delete_class}"
+        if merge_into and (merge_into not in class_map or merge_into == delete_class):
+            return f"Cannot merge into: {merge_into}"
+
+        new_map, mapping = delete_class_mapping(class_map, delete_class, merge_into or None)
+        rewritten = remap_label_files(dataset_dir, mapping)
+
+        registry.replace(new_map)
+        load_node("annotate_images_pygame").write_data_yaml(dataset_dir, new_map)
+
+    action = f"merged into '{merge_into}'" if merge_into else "deleted"
+    return f"Class '{delete_class}' {action}, rewrote {rewritten} label files"
+
+
+main_callable = remap_dataset_classes
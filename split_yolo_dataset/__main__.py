@@ -0,0 +1,239 @@
+from pathlib import Path
+import os
+import sys
+import shutil
+import hashlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# sibling nodes import from the pack folder; shared helpers live in class_registry
+PACK_ROOT = str(Path(__file__).resolve().parent.parent)
+if PACK_ROOT not in sys.path:
+    sys.path.append(PACK_ROOT)
+from class_registry.__main__ import load_node, write_atomic
+
+# =====================
+# CONFIG
+# =====================
+SPLITS = ("train", "val", "test")
+LABEL_CHUNK = 512        # label files per worker task
+LABEL_WORKERS = None     # None -> os.cpu_count()
+COPY_WORKERS = 8         # label files copied in parallel
+
+
+# =====================
+# LABELS
+# =====================
+def label_source(img, labels_dir=None):
+    """
+    Label file of an image: <labels_dir>/<stem>.txt, else the YOLO layout
+    (.../images/x/a.jpg -> .../labels/x/a.txt), else next to the image.
+    """
+    img = Path(img)
+    if labels_dir:
+        return Path(labels_dir) / f"{img.stem}.txt"
+
+    parts = img.parts[:-1]
+    if "images" in parts:
+        i = len(parts) - 1 - parts[::-1].index("images")
+        return Path(*parts[:i], "labels", *parts[i + 1:], f"{img.stem}.txt")
+    return img.with_suffix(".txt")
+
+
+def read_label_classes(paths):
+    # sorted class ids of each label file (pool worker); None without a label file
+    result = []
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as f:
+                result.append(sorted({int(float(line.split(maxsplit=1)[0])) for line in f if line.strip()}))
+        except FileNotFoundError:
+            result.append(None)
+        except (OSError, ValueError) as e:
+            print(f"Cannot read {path}: {e}")
+            result.append(None)
+    return result
+
+
+def read_all_label_classes(paths, workers=LABEL_WORKERS):
+    paths = [str(p) for p in paths]
+    chunks = [paths[i:i + LABEL_CHUNK] for i in range(0, len(paths), LABEL_CHUNK)]
+    if len(chunks) <= 1:
+        return read_label_classes(paths)
+
+    worker = load_node("split_yolo_dataset").read_label_classes
+    with ProcessPoolExecutor(workers) as pool:
+        return [classes for part in pool.map(worker, chunks) for classes in part]
+
+
+def place_label(src, dst):
+    """
+    Copy a source label into the dataset unless the dataset copy is at
+    least as new (edited in the annotator since). True if copied.
+    """
+    try:
+        st = os.stat(src)
+    except FileNotFoundError:
+        return False
+    if os.path.abspath(src) == os.path.abspath(dst):
+        return False
+    try:
+        if os.stat(dst).st_mtime_ns >= st.st_mtime_ns:
+            return False
+    except FileNotFoundError:
+        pass
+
+    # an open annotator never reads half a file
+    write_atomic(dst, lambda tmp: shutil.copy2(src, tmp))
+    return True
+
+# =====================
+# ASSIGNMENT
+# =====================
+def split_key(name):
+    # stable across runs, machines and Python versions (unlike hash())
+    return int(hashlib.sha1(name.encode("utf-8")).hexdigest()[:16], 16)
+
+
+def strata_of(classes_per_image):
+    """
+    Stratum of each image: its rarest class (fewest images), so an image
+    with a rare and a common class is balanced with the rare one;
+    "background" without labels.
+    """
+    images_per_class = Counter(c for classes in classes_per_image if classes for c in classes)
+    return [
+        min(classes, key=lambda c: (images_per_class[c], c)) if classes else "background"
+        for classes in classes_per_image
+    ]
+
+
+def assign_splits(names, strata, existing, fractions):
+    """
+    Split of each name. Names already in a split keep it; new ones, in
+    stable hash order, go to the split furthest below its fraction, in
+    their stratum and over all images together (small strata alone would
+    all start in train). Reruns only add, never reshuffle.
+    """
+    counts = {}
+    overall = Counter()
+    for name, stratum in zip(names, strata):
+        if name in existing:
+            counts.setdefault(stratum, Counter())[existing[name]] += 1
+            overall[existing[name]] += 1
+
+    def below(c, s):
+        # how far split s is below its fraction once one more image is added
+        return fractions[s] * (sum(c.values()) + 1) - c[s]
+
+    result = {name: existing[name] for name in names if name in existing}
+    new = sorted((i for i, name in enumerate(names) if name not in existing), key=lambda i: split_key(names[i]))
+    for i in new:
+        c = counts.setdefault(strata[i], Counter())
+        split = max(SPLITS, key=lambda s: below(c, s) + below(overall, s))
+        c[split] += 1
+        overall[split] += 1
+        result[names[i]] = split
+    return result
+
+# =====================
+# MAIN NODE
+# =====================
+def split_yolo_dataset(
+    image_paths: list = [],
+
+    labels_dir: {
+        "widget_name": "path_preview",
+        "type": str,
+        "label": "Source labels (empty: next to images)",
+    } = "",
+
+    dataset_dir: {
+        "widget_name": "path_preview",
+        "type": str,
+        "label": "Dataset folder",
+    } = "C:/",
+
+    project_dir: {
+        "widget_name": "path_preview",
+        "type": str,
+        "label": "Project folder (shared classes)",
+    } = "",
+
+    val_fraction: float = 0.1,
+    test_fraction: float = 0.0,
+    stratify: bool = True,
+    link_mode: str = "copy",
+):
+    """
+    Split images into train / val / test and place them, with their label
+    files, into dataset/images/<split> and dataset/labels/<split>.
+    Assignment is deterministic: images already in the dataset keep their
+    split, new ones are spread by a stable hash, per rarest class with
+    stratify. data.yaml is written from project_dir/classes.json.
+    """
+    if not image_paths:
+        return "No images"
+    if not (0 <= val_fraction and 0 <= test_fraction and val_fraction + test_fraction < 1):
+        return "val_fraction + test_fraction must be between 0 and 1"
+
+    dataset_dir = Path(dataset_dir)
+    prepare = load_node("prepare_images_for_yolo")
+
+    # one image per file name (as placed by prepare_images_for_yolo)
+    sources = {}
+    for img in prepare.iter_images(image_paths):
+        sources.setdefault(os.path.basename(img), img)
+    names = list(sources)
+
+    existing = {}
+    for split in SPLITS:
+        split_dir = dataset_dir / "images" / split
+        if split_dir.is_dir():
+            for name in os.listdir(split_dir):
+                existing.setdefault(name, split)
+
+    label_paths = [label_source(sources[n], labels_dir) for n in names]
+    if stratify:
+        strata = strata_of(read_all_label_classes(label_paths))
+    else:
+        strata = [None] * len(names)
+
+    fractions = {"train": 1 - val_fraction - test_fraction, "val": val_fraction, "test": test_fraction}
+    assigned = assign_splits(names, strata, existing, fractions)
+
+    lines = []
+    copied = 0
+    for split in SPLITS:
+        members = [i for i, name in enumerate(names) if assigned[name] == split]
+        if not members:
+            continue
+        lines.append(prepare.prepare_images_for_yolo(
+            [sources[names[i]] for i in members], str(dataset_dir), split, link_mode
+        ))
+
+        split_labels = dataset_dir / "labels" / split
+        split_labels.mkdir(parents=True, exist_ok=True)
+        with ThreadPoolExecutor(COPY_WORKERS) as pool:
+            copied += sum(pool.map(
+                lambda i: place_label(label_paths[i], split_labels / f"{Path(names[i]).stem}.txt"), members
+            ))
+
+    if project_dir:
+        # an open annotator may be adding classes: write its latest map
+        registry = load_node("class_registry").ClassRegistry(project_dir)
+        with registry.locked():
+            registry.refresh()
+            load_node("annotate_images_pygame").write_data_yaml(dataset_dir, registry.class_map)
+
+    per_split = Counter(assigned.values())
+    new = sum(1 for name in names if name not in existing)
+    lines.insert(0, (
+        f"Split {len(names)} images ({new} new): "
+        + ", ".join(f"{s} {per_split[s]}" for s in SPLITS)
+        + f"; {copied} label files copied"
+    ))
+    return "\n".join(lines)
+
+
+main_callable = split_yolo_dataset
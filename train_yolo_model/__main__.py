@@ -19,16 +19,22 @@ def train_yolo_model(
     model: str = "yolov8n-seg.pt",
     epochs: int = 100,
     imgsz: int = 640,
+    packed: bool = False,
 ):
     """
     Train YOLOv8 model (custom output directory)
+
+    packed: train on dataset/packed_<imgsz> (pack_yolo_dataset), images
+    already letterboxed to imgsz, nothing large to decode per epoch
     """
 
     dataset_dir = Path(dataset_dir)
+    if packed:
+        dataset_dir = dataset_dir / f"packed_{imgsz}"
     data_yaml = dataset_dir / "data.yaml"
 
     if not data_yaml.exists():
-        return "data.yaml not found"
+        return "packed data.yaml not found (run pack_yolo_dataset)" if packed else "data.yaml not found"
 
     device = "0" if torch.cuda.is_available() else "cpu"
 
@@ -24,19 +24,24 @@ def val_yolo_model(
     run_name: str = "val_run",
 
     imgsz: int = 640,
+    packed: bool = False,
 ):
     """
     YOLOv8 Validation Node
+
+    packed: validate on dataset/packed_<imgsz> (pack_yolo_dataset)
     """
 
     dataset_dir = Path(dataset_dir)
+    if packed:
+        dataset_dir = dataset_dir / f"packed_{imgsz}"
     model_path = Path(model_path)
     output_dir = Path(output_dir)
 
     data_yaml = dataset_dir / "data.yaml"
 
     if not data_yaml.exists():
-        return "data.yaml not found"
+        return "packed data.yaml not found (run pack_yolo_dataset)" if packed else "data.yaml not found"
 
     if not model_path.exists():
         return "model not found"
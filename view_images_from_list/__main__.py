@@ -1,6 +1,22 @@
 from pathlib import Path
 import pygame
+import os
+import sys
+import hashlib
 from math import ceil
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+try:
+    from PIL import Image     # optional: reduced-resolution decoding for thumbnails
+except ImportError:
+    Image = None
+
+# sibling nodes import from the pack folder; shared helpers live in class_registry
+PACK_ROOT = str(Path(__file__).resolve().parent.parent)
+if PACK_ROOT not in sys.path:
+    sys.path.append(PACK_ROOT)
+from class_registry.__main__ import load_node, write_atomic, open_large_image
 
 # =========================
 # 1. CONFIG (ต้องมีเพื่อให้ฟังก์ชันเรียกใช้ได้)
@@ -9,6 +25,16 @@ THUMB_SIZE = (128, 128)
 PREVIEW_MAX_SIZE = (400, 400)
 PADDING = 8
 BG_COLOR = (30, 30, 30)
+GRID_WIDTH = 1200
+PAGE_ROWS = 8            # rows per page of the grid
+THUMBS_IN_MEMORY = 2048  # thumbnails kept by a grid (LRU)
+POOL_MIN_MISSING = 16    # fewer missing thumbnails are made in this process
+
+# ===== THUMBNAIL CACHE =====
+THUMB_CACHE_DIR = Path.home() / ".cache" / "view_images_thumbs"
+THUMB_WORKERS = None     # None -> os.cpu_count()
+STAT_WORKERS = 16        # stat / cache reads in parallel (network shares)
+
 
 # =========================
 # 2. UTILS (ฟังก์ชันที่ระบบแจ้งว่าหาไม่เจอ)
@@ -21,66 +47,193 @@ def scale_keep_ratio(surface, max_size):
         surface, (int(w * scale), int(h * scale))
     )
 
-def make_grid(images, thumb_size, max_width=None):
-    if not images:
+# =========================
+# THUMBNAIL CACHE
+# =========================
+def thumb_cache_path(path):
+    # content address: same file (path, size, mtime) + same thumb size -> same entry
+    st = os.stat(path)
+    key = f"{Path(path).resolve()}|{st.st_size}|{st.st_mtime_ns}|{THUMB_SIZE}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return THUMB_CACHE_DIR / digest[:2] / f"{digest}.png"
+
+
+def save_thumb(save, cache_path):
+    # parallel runs never read half a file
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    write_atomic(cache_path, save)
+
+
+def make_thumb(path, cache_path):
+    """
+    THUMB_SIZE RGBA bytes of one image (pool worker): JPEGs are decoded
+    at reduced resolution (draft), the result is written to the cache.
+    None if the image cannot be read.
+    """
+    try:
+        with open_large_image(path) as im:
+            im.draft("RGB", THUMB_SIZE)
+            thumb = im.convert("RGBA").resize(THUMB_SIZE, Image.LANCZOS)
+        save_thumb(lambda tmp: thumb.save(tmp, format="PNG", compress_level=1), cache_path)
+        return thumb.tobytes()
+    except Exception as e:
+        print(f"Error loading {path}: {e}")
         return None
 
-    cols = max_width // (thumb_size[0] + PADDING) if max_width else 4
-    cols = max(cols, 1)
-    rows = ceil(len(images) / cols)
-
-    width = cols * thumb_size[0] + (cols + 1) * PADDING
-    height = rows * thumb_size[1] + (rows + 1) * PADDING
 
-    surface = pygame.Surface((width, height))
-    surface.fill(BG_COLOR)
+def make_thumb_pygame(path, cache_path):
+    # without PIL: full decode, in this process
+    thumb = pygame.transform.smoothscale(pygame.image.load(str(path)).convert_alpha(), THUMB_SIZE)
+    def save(tmp):
+        with open(tmp, "wb") as f:
+            pygame.image.save(thumb, f, "png")
+    save_thumb(save, cache_path)
+    return thumb
+
+
+def locate_thumb(path):
+    # (cache path, cached thumb | None); (None, None) if the image is gone
+    try:
+        cache_path = thumb_cache_path(path)
+    except OSError as e:
+        print(f"Error loading {path}: {e}")
+        return None, None
+    if not cache_path.exists():
+        return cache_path, None
+    try:
+        return cache_path, pygame.image.load(str(cache_path))
+    except pygame.error:
+        return cache_path, None      # broken entry -> made again
+
+
+def load_thumbs(image_paths):
+    """
+    Thumbnails in image_paths order, None for unreadable images: cached
+    ones are read back, missing ones made (by a process pool when many).
+    """
+    with ThreadPoolExecutor(STAT_WORKERS) as pool:
+        found = list(pool.map(locate_thumb, [str(p) for p in image_paths]))
+
+    thumbs = [thumb for _, thumb in found]
+    missing = [i for i, (cache_path, thumb) in enumerate(found) if cache_path and thumb is None]
+
+    if missing and Image is not None:
+        args = ([str(image_paths[i]) for i in missing], [found[i][0] for i in missing])
+        if len(missing) < POOL_MIN_MISSING:
+            made = list(map(make_thumb, *args))
+        else:
+            worker = load_node("view_images_from_list").make_thumb
+            with ProcessPoolExecutor(THUMB_WORKERS) as pool:
+                made = list(pool.map(worker, *args, chunksize=16))
+        for i, data in zip(missing, made):
+            if data is not None:
+                thumbs[i] = pygame.image.frombuffer(data, THUMB_SIZE, "RGBA")
+    else:
+        for i in missing:
+            try:
+                thumbs[i] = make_thumb_pygame(image_paths[i], found[i][0])
+            except Exception as e:
+                print(f"Error loading {image_paths[i]}: {e}")
+
+    return thumbs
 
-    for i, img in enumerate(images):
-        thumb = pygame.transform.smoothscale(img, thumb_size)
-        x = PADDING + (i % cols) * (thumb_size[0] + PADDING)
-        y = PADDING + (i // cols) * (thumb_size[1] + PADDING)
-        surface.blit(thumb, (x, y))
-
-    return surface
+# =========================
+# VIRTUAL GRID
+# =========================
+class ThumbnailGrid:
+    """
+    Grid of the thumbnails of image_paths that is never drawn as a whole:
+    render() / page_surface() draw only the rows asked for, with thumbnails
+    from the disk cache (LRU in memory), so memory follows the viewport,
+    not the number of images. Unreadable images leave an empty cell.
+    """
+
+    def __init__(self, image_paths, thumb_size=THUMB_SIZE, max_width=GRID_WIDTH, page_rows=PAGE_ROWS):
+        self.image_paths = list(image_paths)
+        self.cols = max(max_width // (thumb_size[0] + PADDING), 1)
+        self.rows = ceil(len(self.image_paths) / self.cols)
+        self.page_rows = page_rows
+        self.page = 0
+        self.thumbs = OrderedDict()    # idx -> thumbnail | None
+
+        self.cell_w = thumb_size[0] + PADDING
+        self.cell_h = thumb_size[1] + PADDING
+        self.width = self.cols * self.cell_w + PADDING
+        self.height = self.rows * self.cell_h + PADDING    # virtual, never allocated
+
+    def __len__(self):
+        return len(self.image_paths)
+
+    @property
+    def pages(self):
+        return max(1, ceil(self.rows / self.page_rows))
+
+    def get_thumbs(self, indices):
+        missing = [i for i in indices if i not in self.thumbs]
+        if missing:
+            for i, thumb in zip(missing, load_thumbs([self.image_paths[i] for i in missing])):
+                self.thumbs[i] = thumb
+        for i in indices:
+            self.thumbs.move_to_end(i)
+        while len(self.thumbs) > max(THUMBS_IN_MEMORY, len(indices)):
+            self.thumbs.popitem(last=False)
+        return [self.thumbs[i] for i in indices]
+
+    def render(self, y, height):
+        """Surface of the grid rows between y and y + height (grid pixels)."""
+        y = max(0, min(int(y), self.height - 1))
+        height = max(1, min(int(height), self.height - y))
+        surface = pygame.Surface((self.width, height))
+        surface.fill(BG_COLOR)
+
+        first = max(0, (y - PADDING) // self.cell_h)
+        last = min(self.rows - 1, (y + height) // self.cell_h)
+        indices = list(range(first * self.cols, min((last + 1) * self.cols, len(self))))
+
+        for i, thumb in zip(indices, self.get_thumbs(indices)):
+            if thumb is None:
+                continue
+            x = PADDING + (i % self.cols) * self.cell_w
+            ty = PADDING + (i // self.cols) * self.cell_h - y
+            surface.blit(thumb, (x, ty))
+        return surface
+
+    def page_surface(self, page=None):
+        page = self.page if page is None else max(0, min(page, self.pages - 1))
+        return self.render(page * self.page_rows * self.cell_h, self.page_rows * self.cell_h + PADDING)
+
+    def set_page(self, page):
+        # the page the loop viewer shows (clamped to the grid)
+        self.page = max(0, min(int(page), self.pages - 1))
+        return self.page
+
+    def preview(self, max_size=PREVIEW_MAX_SIZE):
+        return scale_keep_ratio(self.page_surface(), max_size)
 
 # =========================
 # 3. MAIN NODE
 # =========================
 def view_images_from_list(
     image_paths: list = [], # รับค่า list ของ Path จาก node ก่อนหน้า
+    page: int = 0,          # page of PAGE_ROWS rows shown (0 = first)
 ):
+    # lazy batches (load_images_from_folder): the grid needs the whole list
+    image_paths = list(load_node("prepare_images_for_yolo").iter_images(image_paths))
     if not image_paths:
         return None
 
-    images = []
-    for p in image_paths:
-        try:
-            path_str = str(p) 
-            img = pygame.image.load(path_str).convert_alpha()
-            images.append(img)
-        except Exception as e:
-            print(f"Error loading {p}: {e}")
-            pass
-
-    if not images:
-        return None
+    # virtual grid: pages are drawn on demand from the thumbnail cache
+    grid = ThumbnailGrid(image_paths)
+    grid.set_page(page)
 
-    # เรียกใช้ make_grid (ตอนนี้มีฟังก์ชันรองรับแล้ว)
-    full_surface = make_grid(
-        images,
-        THUMB_SIZE,
-        max_width=1200
-    )
-
-    # เรียกใช้ scale_keep_ratio
-    preview_surface = scale_keep_ratio(
-        full_surface,
-        PREVIEW_MAX_SIZE
-    )
+    # เรียกใช้ scale_keep_ratio (shown page only)
+    preview_surface = grid.preview()
 
     return {
         'preview_surface': preview_surface,
-        'full_surface': full_surface,
+        'grid': grid,
+        'page': grid.page,
+        'pages': grid.pages,
     }
 
 main_callable = view_images_from_list
@@ -89,4 +242,4 @@ main_callable = view_images_from_list
 # 4. VIEWER HOOKS
 # =========================
 get_sideviz_from_output = lambda o: o['preview_surface'] if (o and 'preview_surface' in o) else None
-get_loopviz_from_output = lambda o: o['full_surface'] if (o and 'full_surface' in o) else None
\ No newline at end of file
+get_loopviz_from_output = lambda o: o['grid'].page_surface() if (o and 'grid' in o) else None
@@ -1,73 +1,192 @@
 from pathlib import Path
 import pygame
+import sys
+import threading
+from collections import OrderedDict
+
+try:
+    from PIL import Image     # optional: reduced decode of very large images
+except ImportError:
+    Image = None
+
+# sibling nodes import from the pack folder; shared helpers live in class_registry
+PACK_ROOT = str(Path(__file__).resolve().parent.parent)
+if PACK_ROOT not in sys.path:
+    sys.path.append(PACK_ROOT)
+from class_registry.__main__ import load_node, open_large_image
 
 pygame.init()
 
+WINDOW_SIZE = (900, 700)
+LARGE_IMAGE_PIXELS = 50_000_000
+PREFETCH_RADIUS = 3      # images fitted ahead / behind the current one
+CACHE_IMAGES = 16        # fitted surfaces kept (LRU)
+
+
+def load_image(path):
+    # very large files: decode a window-sized copy (JPEG draft) instead of every pixel
+    if Image is not None:
+        try:
+            with open_large_image(path) as im:
+                if im.size[0] * im.size[1] > LARGE_IMAGE_PIXELS:
+                    im.draft("RGB", WINDOW_SIZE)
+                    im = im.convert("RGB")
+                    im.thumbnail(WINDOW_SIZE)
+                    return pygame.image.frombuffer(im.tobytes(), im.size, "RGB").convert()
+        except Exception:
+            pass
+    return pygame.image.load(str(path)).convert_alpha()
+
+
+def fit_image(path):
+    img = load_image(path)
+    target = img.get_rect().fit(pygame.Rect((0, 0), WINDOW_SIZE))
+    return pygame.transform.smoothscale(img, target.size)
+
+
+class FittedCache:
+    """
+    Window-fitted surfaces of the images around the current index,
+    prefetched in a worker thread and LRU-evicted; only these are in
+    memory, whatever the length of the list. None = cannot be read.
+    """
+
+    def __init__(self, image_paths):
+        self.image_paths = image_paths
+        self.entries = OrderedDict()   # idx -> fitted surface | None
+
+        self.pending = []              # nearest first
+        self.loading = None
+        self.closed = False
+        self.cond = threading.Condition()
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def load(self, idx):
+        try:
+            return fit_image(self.image_paths[idx])
+        except Exception as e:
+            print(f"Error loading {self.image_paths[idx]}: {e}")
+            return None
+
+    def get(self, idx):
+        with self.cond:
+            while self.loading == idx:
+                self.cond.wait()
+            if idx in self.entries:
+                self.entries.move_to_end(idx)
+                return self.entries[idx]
+
+        # not prefetched (first image / long jump) -> load here
+        surface = self.load(idx)
+        with self.cond:
+            self.store(idx, surface)
+        return surface
+
+    def prefetch(self, idx):
+        order = []
+        for d in range(1, PREFETCH_RADIUS + 1):
+            order += [idx + d, idx - d]
+
+        with self.cond:
+            self.pending = [
+                i for i in order
+                if 0 <= i < len(self.image_paths) and i not in self.entries
+            ]
+            self.cond.notify_all()
+
+    def store(self, idx, surface):
+        self.entries[idx] = surface
+        self.entries.move_to_end(idx)
+        while len(self.entries) > CACHE_IMAGES:
+            self.entries.popitem(last=False)
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                idx = self.pending.pop(0)
+                if idx in self.entries:
+                    continue
+                self.loading = idx
+
+            surface = self.load(idx)
+
+            with self.cond:
+                self.loading = None
+                self.store(idx, surface)
+                self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
 def view_images_popup(
     image_paths: {
         'type': object,   # รับ list จาก node ก่อนหน้า
     },
 ):
     # --------------------------------
-    # normalize input (Nodezator อาจส่ง list ซ้อน)
+    # normalize input (Nodezator อาจส่ง list ซ้อน, or lazy batches: whole scan first)
     # --------------------------------
-    if isinstance(image_paths, (list, tuple)) and image_paths:
-        if isinstance(image_paths[0], (list, tuple)):
-            image_paths = image_paths[0]
+    image_paths = list(load_node("prepare_images_for_yolo").iter_images(image_paths or []))
 
     if not image_paths:
         return None
 
     # --------------------------------
-    # load images
-    # --------------------------------
-    images = []
-    for p in image_paths:
-        try:
-            images.append(pygame.image.load(str(p)).convert_alpha())
-        except Exception:
-            pass
-
-    if not images:
-        return None
-
-    # --------------------------------
-    # open popup window
+    # open popup window (images are loaded lazily, around the index)
     # --------------------------------
-    screen = pygame.display.set_mode((900, 700))
+    screen = pygame.display.set_mode(WINDOW_SIZE)
     pygame.display.set_caption("Image Viewer (ESC to close)")
+    cache = FittedCache(image_paths)
+    font = pygame.font.Font(None, 24)
 
-    clock = pygame.time.Clock()
     index = 0
+    shown = None      # index on screen (redraw only when it changes)
     running = True
 
     while running:
-        for event in pygame.event.get():
+        if shown != index:
+            screen.fill((20, 20, 20))
+
+            scaled = cache.get(index)
+            cache.prefetch(index)
+            if scaled is None:
+                scaled = font.render(f"Cannot load {Path(image_paths[index]).name}", True, (220, 220, 220))
+            rect = scaled.get_rect(center=screen.get_rect().center)
+            screen.blit(scaled, rect)
+
+            pygame.display.flip()
+            shown = index
+
+        # sleep until the next event (no idle redraw)
+        for event in [pygame.event.wait()] + pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
 
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                shown = None
+
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_RIGHT:
                     index += 1
                 elif event.key == pygame.K_LEFT:
                     index -= 1
                 elif event.key == pygame.K_ESCAPE:
+                    cache.close()
                     return "Exited"  # ออกแค่ pop-up
 
-                index = max(0, min(index, len(images) - 1))
-
-        screen.fill((20, 20, 20))
-
-        img = images[index]
-        target = img.get_rect().fit(screen.get_rect())
-        scaled = pygame.transform.smoothscale(img, target.size)
-        rect = scaled.get_rect(center=screen.get_rect().center)
-        screen.blit(scaled, rect)
-
-        pygame.display.flip()
-        clock.tick(60)
+                index = max(0, min(index, len(image_paths) - 1))
 
     # ปิดแค่หน้าต่าง ไม่ปิด pygame ทั้งระบบ
+    cache.close()
     pygame.display.quit()
 
     return None